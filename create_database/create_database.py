@@ -6,6 +6,8 @@ import numpy as np
 import pandas as pd
 import decimal
 
+from ionize.Database.table import write_table
+
 ALIASES = {'chloride': 'hydrochloric acid',
            'laurylsulfonic acid': 'dodecylsulfonic acid',
            'barium hydroxide': 'barium',
@@ -254,6 +256,10 @@ class DataCreator(object):
             json.dump(self.data, ion_file,
                       sort_keys=True, indent=4, separators=(',', ': '))
 
+        table_path = os.path.splitext(path)[0] + '.npy'
+        print(table_path)
+        write_table(self.data, table_path)
+
     def check(self):
         # Check to make that all of the entries in the steep db were added
         # for name in steep_db.keys():
@@ -0,0 +1,306 @@
+"""Module containing the AmpholyteMixture class."""
+from __future__ import division
+import copy
+import numpy as np
+
+from .Ion import Ion, BaseIon
+from .Ion.mobility import _corrected_mobility
+from .Solvent import Aqueous
+from .Database import Database
+from .constants import reference_temperature, kelvin, faraday, lpm3, \
+    boltzmann, elementary_charge
+from .Solution.equilibrium import _acidity_table, _log_acidity_product, \
+    _batch_equilibrium
+
+database = Database()
+
+
+class AmpholyteMixture(object):
+
+    """Represent a mixture of carrier ampholytes for isoelectric focusing.
+
+    Each species is a simple ampholyte, with a cationic and an anionic state
+    and a pKa on either side of its isoelectric point. The species are held
+    as arrays, rather than as Ion objects, so that mixtures of thousands of
+    species are equilibrated in time linear in the number of species.
+
+    :param pI: The isoelectric point of each species.
+    :param concentrations: The concentration of each species, in M.
+    :param delta_pKa: The difference between the pKa of the anionic state
+    and the pKa of the cationic state of each species.
+    :param mobility: The absolute mobility of the charged states of each
+    species at the reference temperature, in m^2/V/s, by magnitude.
+
+    The pKas are taken to be independent of temperature.
+
+    Example:
+        ``ampholytes = ionize.AmpholyteMixture.uniform(3, 10, 1000, 0.02)
+        position, concentrations = ampholytes.focus(0.05, 200, 2000.)
+        ampholytes.profile(concentrations)['pH']``
+    """
+
+    _solvent = Aqueous
+    reference_temperature = reference_temperature
+
+    # The largest number of mobility groups in the Onsager-Fuoss correction.
+    _mobility_groups = 32
+
+    _pI = None
+    _concentrations = None
+    _delta_pKa = None
+    _mobility = None
+
+    valence = np.array([-1, 1])
+
+    @property
+    def pI(self):
+        """The isoelectric point of each species."""
+        return self._pI
+
+    @property
+    def concentrations(self):
+        """The concentration of each species, in M."""
+        return self._concentrations
+
+    @property
+    def pKa(self):
+        """The pKa of the anionic and cationic state of each species."""
+        return (self._pI[:, np.newaxis] +
+                np.multiply.outer(self._delta_pKa, [.5, -.5]))
+
+    def __init__(self, pI, concentrations, delta_pKa=2., mobility=2.5e-8):
+        """Initialize an AmpholyteMixture object."""
+        self._pI = np.array(pI, dtype=float, ndmin=1)
+        self._concentrations, self._delta_pKa, self._mobility = \
+            (np.broadcast_to(np.array(value, dtype=float),
+                             self._pI.shape).copy()
+             for value in (concentrations, delta_pKa, mobility))
+
+        if np.any(self._concentrations < 0):
+            raise ValueError('Concentrations must be positive.')
+        if np.any(self._mobility <= 0):
+            raise ValueError('Mobilities must be positive.')
+
+    @classmethod
+    def uniform(cls, pH_low, pH_high, species, concentration, delta_pKa=2.,
+                mobility=2.5e-8):
+        """Return a mixture with isoelectric points evenly spread in a range.
+
+        :param pH_low: The lowest isoelectric point.
+        :param pH_high: The highest isoelectric point.
+        :param species: The number of species.
+        :param concentration: The total concentration of the mixture, split
+        evenly among the species, in M.
+        """
+        return cls(np.linspace(pH_low, pH_high, species),
+                   concentration / species, delta_pKa, mobility)
+
+    def absolute_mobility(self, temperature=None):
+        """Return the mobility of the states of each species, in m^2/V/s.
+
+        The anionic state is first. Mobilities are corrected for the
+        viscosity of the solvent, as for Ion.
+        """
+        if temperature is None:
+            temperature = self.reference_temperature
+        return (self._solvent.viscosity(self.reference_temperature) /
+                self._solvent.viscosity(temperature) *
+                self._mobility[:, np.newaxis] * self.valence)
+
+    def diffusivity(self, temperature=None):
+        """Return the diffusivity of each species, in m^2/s."""
+        if temperature is None:
+            temperature = self.reference_temperature
+        return (self.absolute_mobility(temperature)[:, 1] * boltzmann *
+                kelvin(temperature) / elementary_charge)
+
+    def _acidity_table(self):
+        """Return the padded table of the charge states of each species.
+
+        The table matches _acidity_table, with the neutral state between the
+        anionic and cationic state of each species.
+        """
+        valence_zero = np.array([-1, 0, 1])
+        valence = np.broadcast_to(valence_zero, (len(self), 3))
+        log_L = _log_acidity_product(-self.pKa, valence_zero)
+        activity_L = np.broadcast_to(
+            _log_acidity_product(valence_zero[1:]**2 -
+                                 valence_zero[:-1]**2 - 1, valence_zero),
+            (len(self), 3))
+        return valence, log_L, activity_L
+
+    def focus(self, length, cells, field, pH_low=None, pH_high=None,
+              temperature=None):
+        """Return the focused distribution of the species in a channel.
+
+        The pH is taken to change linearly along the channel, from pH_low to
+        pH_high, and each species focuses to a Gaussian zone at its
+        isoelectric point. The width of each zone balances diffusion against
+        the slope of the mobility near the isoelectric point. The amount of
+        each species in the channel is conserved.
+
+        Returns the position of each cell, and the concentration of each
+        species in each cell, with one row per cell.
+
+        :param length: The length of the channel, in m.
+        :param cells: The number of cells.
+        :param field: The magnitude of the electric field, in V/m.
+        :param pH_low: The pH at the start of the channel. Defaults to the
+        lowest isoelectric point.
+        :param pH_high: The pH at the end of the channel. Defaults to the
+        highest isoelectric point.
+        """
+        pH_low = np.min(self._pI) if pH_low is None else pH_low
+        pH_high = np.max(self._pI) if pH_high is None else pH_high
+        dx = length / cells
+        position = (np.arange(cells) + .5) * dx
+        gradient = (pH_high - pH_low) / length
+
+        # At the isoelectric point, the cationic and anionic fractions are
+        # equal, so the slope of the charge with pH is ln(10) times the
+        # variance of the valence, twice the cationic fraction.
+        cationic = 1. / (2. + 10**(self._delta_pKa / 2.))
+        mobility = self.absolute_mobility(temperature)[:, 1]
+        slope = np.log(10.) * 2. * cationic * mobility * gradient
+        width = np.sqrt(self.diffusivity(temperature) / (field * slope))
+
+        center = (self._pI - pH_low) / gradient
+        weights = np.exp(-.5 * ((position[:, np.newaxis] - center) /
+                                np.maximum(width, dx / 2.))**2)
+        weights = weights / np.maximum(np.sum(weights, 0),
+                                       np.finfo(float).tiny)
+        return position, weights * cells * self._concentrations
+
+    def profile(self, concentrations=None, ions=(), ion_concentrations=None,
+                temperature=None):
+        """Return the pH, ionic strength, and conductivity of many solutions.
+
+        Each solution holds the species of the mixture, and optionally other
+        ions. The charge balance is solved over the charge states of every
+        species at once. Charged states with the same valence and mobility
+        are interchangeable in the Onsager-Fuoss correction to mobility, so
+        the states of the species are lumped by mobility, which is exact.
+        Mixtures with many distinct mobilities are lumped into groups of
+        similar mobility, each at the concentration weighted mean mobility of
+        its states, so that the cost of the correction does not grow with the
+        number of species. The uncorrected conductivity is still exact.
+
+        Returns a dict with the 'pH', 'ionic_strength', and 'conductivity', in
+        S/m, of each solution.
+
+        :param concentrations: The concentration of each species in each
+        solution, with one row per solution. Defaults to the concentrations of
+        the mixture.
+        :param ions: An iterable of other ions or names, with discrete charge
+        states.
+        :param ion_concentrations: The concentration of each other ion in
+        each solution, with one row per solution.
+        :param temperature: The temperature of the solutions, in Celsius.
+        """
+        if temperature is None:
+            temperature = reference_temperature
+        if concentrations is None:
+            concentrations = self._concentrations
+        concentrations = np.array(concentrations, dtype=float, ndmin=2)
+        if isinstance(ions, (str, BaseIon)):
+            ions = (ions,)
+        ions = [database.load(ion) if isinstance(ion, str)
+                else copy.copy(ion) for ion in ions]
+        if ion_concentrations is None:
+            ion_concentrations = np.zeros((len(concentrations), len(ions)))
+        ion_concentrations = np.broadcast_to(
+            np.array(ion_concentrations, dtype=float),
+            (len(concentrations), len(ions)))
+
+        # Pad the tables of the species and the ions to the same states.
+        tables = [self._acidity_table()]
+        if ions:
+            tables.append(_acidity_table(ions, temperature))
+        states = max(table[0].shape[1] for table in tables)
+        valence, log_L0, activity_L = (
+            np.concatenate([np.pad(table[k], ((0, 0), (0, states -
+                                                        table[k].shape[1])),
+                                   constant_values=fill)
+                            for table in tables])
+            for k, fill in enumerate((0., -np.inf, 0.)))
+        total = np.concatenate([concentrations, ion_concentrations], -1)
+
+        pH, ionic_strength, dissociation, fractions, _ = \
+            _batch_equilibrium(self._solvent, valence, log_L0, activity_L,
+                               total, temperature)
+
+        # Lump the charged states of the species by their mobility, or by
+        # quantile groups of mobility if there are too many mobilities.
+        group = np.unique(self._mobility, return_inverse=True)[1]
+        if group.max() >= self._mobility_groups:
+            edges = np.quantile(self._mobility, np.linspace(
+                0., 1., self._mobility_groups + 1)[1:-1])
+            group = np.unique(np.searchsorted(edges, self._mobility),
+                              return_inverse=True)[1]
+        group = group.ravel()
+        members = np.zeros((len(self), group.max() + 1))
+        members[np.arange(len(self)), group] = 1.
+        mean = np.dot(self._mobility, members) / np.sum(members, 0)
+        low = np.array([self._mobility[group == k].min()
+                        for k in range(members.shape[1])])
+        high = np.array([self._mobility[group == k].max()
+                         for k in range(members.shape[1])])
+        species = len(self)
+        lumped, mobility = [], []
+        for column in (0, 2):
+            state = concentrations * fractions[:, :species, column]
+            lumped.append(np.dot(state, members))
+            weighted = np.dot(state * self._mobility, members)
+            # The mean is clipped to the group, against underflow.
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mobility.append(np.clip(np.where(lumped[-1] > 0,
+                                                 weighted / lumped[-1], mean),
+                                        low, high))
+
+        charged = valence[species:] != 0
+        water = (database['hydroxide'], database['hydronium'])
+        gamma = self._solvent.activity(1., ionic_strength, temperature)
+        cH = 10**(-pH) / gamma
+        cOH = dissociation / cH / gamma**2
+
+        viscosity = (self._solvent.viscosity(self.reference_temperature) /
+                     self._solvent.viscosity(temperature))
+        groups = members.shape[1]
+        state_valence = np.concatenate([-np.ones(groups), np.ones(groups),
+                                        valence[species:][charged],
+                                        [-1., 1.]])
+        others = np.concatenate([ion.absolute_mobility(temperature)
+                                 for ion in ions + list(water)])
+        state_mobility = np.concatenate(
+            [-viscosity * mobility[0], viscosity * mobility[1],
+             np.broadcast_to(others, (len(concentrations), others.size))], -1)
+        state_concentrations = np.concatenate(
+            lumped + [(ion_concentrations[:, :, np.newaxis] *
+                       fractions[:, species:])[:, charged],
+                      cOH[:, np.newaxis], cH[:, np.newaxis]], -1)
+
+        corrected = _corrected_mobility(state_mobility, state_valence,
+                                        state_concentrations, ionic_strength,
+                                        self._solvent, temperature)
+        conductivity = lpm3 * faraday * np.sum(state_concentrations *
+                                               state_valence * corrected, -1)
+        return {'pH': pH, 'ionic_strength': ionic_strength,
+                'conductivity': conductivity}
+
+    def ions(self):
+        """Return a list of an Ion for each species.
+
+        Ions allow the mixture to be used in a Solution, for small mixtures.
+        """
+        mobility = self.absolute_mobility()
+        return [Ion('ampholyte {}'.format(index), self.valence, pKa,
+                    mobility[index])
+                for index, pKa in enumerate(self.pKa)]
+
+    def __len__(self):
+        return self._pI.size
+
+    def __repr__(self):
+        """Return a representation of the AmpholyteMixture."""
+        return 'AmpholyteMixture({} species, pI {:.2f} to {:.2f})'.format(
+            len(self), np.min(self._pI), np.max(self._pI))
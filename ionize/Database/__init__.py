@@ -3,43 +3,117 @@ import json
 import re
 import os
 import operator
+import copy
 
 from ..Ion import Ion
+from .fuzzy import FuzzyIndex
+from .table import ion_table, read_table, TableData
 
 
 class Database(object):
-    """A database containing ion information."""
+    """A database containing ion information.
+
+    The source is parsed on first use, and the parsed data and ions are shared
+    by every Database with the same source. Each ion is constructed once, and
+    lookups return copies, so that each copy can take its own context.
+
+    The source may be a JSON file, or a columnar .npy table written by
+    :func:`table.write_table`. Tables are memory mapped rather than parsed. The
+    default table is available as ``Database(Database.default_table)``.
+    """
 
     _default_source = os.path.join(os.getcwd(),
                                    os.path.dirname(__file__),
                                    'ion_data.json')
-
-    data = property(operator.attrgetter("_data"))
-    _data = None
+    default_table = os.path.splitext(_default_source)[0] + '.npy'
 
     source = property(operator.attrgetter("_source"))
     _source = None
 
+    # Parsed data and interned ions for each source, shared by all instances.
+    _shared = dict()
+
     def __init__(self, source=None):
         """Initialize a Database instance."""
         self._source = source or self._default_source
-        self._open()
+
+    @property
+    def data(self):
+        """The ion data, parsed from the source on first use."""
+        return self._shared_state()['data']
+
+    @property
+    def table(self):
+        """The ion data as a columnar numpy structured array.
+
+        Each row is a database entry. The properties of each valence state are
+        padded to the same length, with NaN for missing values.
+        """
+        state = self._shared_state()
+        if 'table' not in state:
+            if isinstance(state['data'], TableData):
+                state['table'] = state['data'].table
+            else:
+                state['table'] = ion_table(state['data'])
+        return state['table']
+
+    def _shared_state(self):
+        try:
+            return self._shared[self.source]
+        except KeyError:
+            data = self._open()
+            index = self._index(data)
+            state = self._shared[self.source] = {'data': data,
+                                                 'ions': dict(),
+                                                 'index': index,
+                                                 'keys': tuple(sorted(data))}
+            return state
 
     def _open(self):
+        if self.source.endswith('.npy'):
+            return TableData(read_table(self.source))
+
         with open(self.source, 'r') as fp:
-            self._data = json.load(fp)
+            return json.load(fp)
+
+    @staticmethod
+    def _index(data):
+        """Return a dictionary from each name to its database entry.
+
+        The index covers each key and its lowercase form, and resolves aliases
+        to the entry that they refer to.
+        """
+        if isinstance(data, TableData):
+            targets = data.targets()
+        else:
+            targets = {key: value.get('alias_of', key)
+                       for key, value in data.items()}
+
+        index = dict(targets)
+        for key, target in targets.items():
+            index.setdefault(key.lower(), target)
+        return index
+
+    def _resolve(self, name):
+        """Return the name of the database entry that matches the name."""
+        index = self._shared_state()['index']
+        try:
+            return index[name]
+        except KeyError:
+            try:
+                return index[name.lower()]
+            except (KeyError, AttributeError):
+                raise NameError('Ion {} not found in database.'.format(name))
 
     def load(self, name):
         """Return an ion from the database based on the name."""
-        if name in self.data:
-            name = self.data[name].get('alias_of', name)
-            data = {key: value for
-                    key, value in self.data[name].items() if key != '__ion__'}
-            return Ion(**data)
-        elif name.lower() in self.data:
-            return self.load(name.lower())
-        else:
-            raise NameError('Ion {} not found in database.'.format(name))
+        ions = self._shared_state()['ions']
+        entry = self._resolve(name)
+        if entry not in ions:
+            data = {key: value for key, value in self.data[entry].items()
+                    if key != '__ion__'}
+            ions[entry] = Ion(**data)
+        return copy.copy(ions[entry])
 
     def search(self, searchstring):
         """Return each name in the database that matches the searchstring.
@@ -49,13 +123,28 @@ class Database(object):
         return tuple(sorted([str(key) for key in self.data.keys()
                              if re.search(searchstring, key)]))
 
+    def suggest(self, name, limit=10):
+        """Return the names in the database that best match a misspelled name.
+
+        Matches are ranked by edit distance, and names that start with the
+        name are ranked first, so the name may be incomplete. For pattern
+        queries, use search.
+
+        :param name: The approximate name.
+        :param limit: The maximum number of names to return.
+        """
+        state = self._shared_state()
+        if 'fuzzy' not in state:
+            state['fuzzy'] = FuzzyIndex(state['keys'])
+        return state['fuzzy'].search(name, limit)
+
     def keys(self):
-        """Return the keys of the database as a list."""
-        return sorted(self.data.keys())
+        """Return the keys of the database as a sorted list."""
+        return list(self._shared_state()['keys'])
 
     def serialize(self):
         """Return a JSON formatted serialization of the database."""
-        return json.dumps(self.data)
+        return json.dumps(dict(self.data))
 
     def __getitem__(self, key):
         """Return the ion that matches the key."""
@@ -63,14 +152,18 @@ class Database(object):
 
     def __iter__(self):
         """Retern a generator that yields each ion in the Database."""
-        for key in self.keys():
-            yield self[key]
+        for key in self._shared_state()['keys']:
+            yield self.load(key)
 
     def __contains__(self, key):
-        return key in self.keys() 
+        try:
+            self._resolve(key)
+        except (NameError, TypeError):
+            return False
+        return True
 
     def __repr__(self):
         return 'Database("{}")'.format(self.source)
 
     def __str__(self):
-        return 'Database: {} entries'.format(len(self.keys()))
+        return 'Database: {} entries'.format(len(self.data))
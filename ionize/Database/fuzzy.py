@@ -0,0 +1,104 @@
+"""Fuzzy name matching for the ionize Database."""
+from bisect import bisect_left
+from collections import defaultdict
+
+
+def prefix_distance(query, name, cutoff):
+    """Return the edit distance from the query to the closest prefix of name.
+
+    Only distances up to the cutoff are computed. If every prefix of the name
+    is further than the cutoff, return None.
+    """
+    far = cutoff + 1
+    name = name[:len(query) + cutoff]
+    previous = list(range(len(name) + 1))
+    for i, a in enumerate(query, 1):
+        current = [i if i <= cutoff else far]
+        for j in range(1, len(name) + 1):
+            if abs(i - j) > cutoff:
+                current.append(far)
+                continue
+            distance = previous[j - 1] + (a != name[j - 1])
+            if previous[j] < distance:
+                distance = previous[j] + 1
+            if current[-1] < distance:
+                distance = current[-1] + 1
+            current.append(distance)
+        if min(current) > cutoff:
+            return None
+        previous = current
+    return min(previous)
+
+
+def _trigrams(name):
+    """Return the set of trigrams in a name, padded to mark the start."""
+    name = '  ' + name + ' '
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+
+class FuzzyIndex(object):
+
+    """An index of names for ranked, approximate matching.
+
+    Candidates are found with a trigram index and a sorted prefix index, then
+    ranked by edit distance. Names are scored by the distance from the query to
+    their closest prefix, so a name that starts with the query ranks as an
+    exact match, and the index suits completion as the query is typed.
+
+    :param names: An iterable of the names to index.
+    """
+
+    def __init__(self, names):
+        self._names = dict()
+        self._trigrams = defaultdict(set)
+        for name in names:
+            folded = name.lower()
+            self._names.setdefault(folded, name)
+            for trigram in _trigrams(folded):
+                self._trigrams[trigram].add(folded)
+        self._sorted = sorted(self._names)
+
+    def _prefixed(self, query):
+        """Yield each indexed name that starts with the query."""
+        for folded in self._sorted[bisect_left(self._sorted, query):]:
+            if not folded.startswith(query):
+                break
+            yield folded
+
+    def search(self, query, limit=10, candidates=30):
+        """Return the names that best match the query, best first.
+
+        :param query: The approximate name.
+        :param limit: The maximum number of names to return.
+        :param candidates: The number of names that share the most trigrams
+        with the query to score by edit distance.
+        """
+        query = query.lower()
+
+        # Matches must be within a third of the query length, and at most
+        # three edits.
+        cutoff = min(3, max(1, len(query) // 3))
+
+        shared = defaultdict(int)
+        trigrams = _trigrams(query)
+        for trigram in trigrams:
+            for folded in self._trigrams.get(trigram, ()):
+                shared[folded] += 1
+
+        # Each edit changes at most three trigrams, and a prefix match can
+        # miss the trigram that marks the end of the query.
+        minimum = len(trigrams) - 1 - 3 * cutoff
+        pool = set(sorted([folded for folded, count in shared.items()
+                           if count >= minimum],
+                          key=shared.get, reverse=True)[:candidates])
+        pool.update(self._prefixed(query))
+
+        # Ties go to the shorter name, which needs fewer edits to complete.
+        scored = []
+        for folded in pool:
+            distance = prefix_distance(query, folded, cutoff)
+            if distance is not None:
+                scored.append((distance, len(folded), folded))
+
+        return tuple(self._names[folded]
+                     for _, _, folded in sorted(scored)[:limit])
@@ -0,0 +1,144 @@
+"""Columnar tables of ion data.
+
+The ion data can be stored as a single numpy structured array, with one row
+per database entry. Each row holds the entry key, the ion name, its aliases,
+and padded columns of the properties of each valence state. Missing values are
+stored as NaN. Saved as a .npy file, the table can be memory mapped, so that
+many processes share the same pages and vectorized code can read the
+parameters of every ion without constructing Ion objects.
+"""
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+import numpy as np
+
+# Aliases are stored in a single string field, joined by the separator.
+_separator = '|'
+
+_state_properties = ('reference_pKa', 'reference_mobility', 'enthalpy',
+                     'heat_capacity')
+
+
+def _dtype(name_length, alias_length, states, fit_length):
+    """Return the structured dtype of a table."""
+    return np.dtype([('key', 'U{}'.format(name_length)),
+                     ('name', 'U{}'.format(name_length)),
+                     ('alias_of', 'U{}'.format(name_length)),
+                     ('alias', 'U{}'.format(alias_length)),
+                     ('states', 'i1'),
+                     ('valence', 'i1', (states,))] +
+                    [(prop, 'f8', (states,)) for prop in _state_properties] +
+                    [('molecular_weight', 'f8'),
+                     ('nightingale_fit', 'f8', (fit_length,)),
+                     ('nightingale_min', 'f8'),
+                     ('nightingale_max', 'f8')])
+
+
+def ion_table(data):
+    """Return a columnar table of the ion data.
+
+    :param data: A dictionary of database entries, as in ion_data.json.
+    """
+    keys = sorted(data.keys())
+    entries = [data[key] for key in keys if 'alias_of' not in data[key]]
+    names = list(keys) + [entry['name'] for entry in entries]
+    aliases = [_separator.join(entry['alias'] or ()) for entry in entries]
+    fits = [entry['nightingale_data']['fit'] for entry in entries
+            if entry['nightingale_data']]
+
+    table = np.zeros(len(keys),
+                     _dtype(max(len(name) for name in names),
+                            max([len(alias) for alias in aliases] + [1]),
+                            max(len(entry['valence']) for entry in entries),
+                            max([len(fit) for fit in fits] + [1])))
+    for prop in _state_properties + ('molecular_weight', 'nightingale_fit',
+                                     'nightingale_min', 'nightingale_max'):
+        table[prop] = np.nan
+
+    for row, key in zip(table, keys):
+        entry = data[key]
+        row['key'] = key
+        if 'alias_of' in entry:
+            row['alias_of'] = entry['alias_of']
+            continue
+
+        states = len(entry['valence'])
+        row['name'] = entry['name']
+        row['alias'] = _separator.join(entry['alias'] or ())
+        row['states'] = states
+        row['valence'][:states] = entry['valence']
+        for prop in _state_properties:
+            if entry[prop] is not None:
+                row[prop][:states] = entry[prop]
+        if entry['molecular_weight'] is not None:
+            row['molecular_weight'] = entry['molecular_weight']
+        if entry['nightingale_data'] is not None:
+            fit = entry['nightingale_data']['fit']
+            row['nightingale_fit'][:len(fit)] = fit
+            row['nightingale_min'] = entry['nightingale_data']['min']
+            row['nightingale_max'] = entry['nightingale_data']['max']
+
+    return table
+
+
+def write_table(data, path):
+    """Write a columnar table of the ion data to a .npy file."""
+    np.save(path, ion_table(data))
+
+
+def read_table(path):
+    """Return a read-only, memory mapped table from a .npy file."""
+    return np.load(path, mmap_mode='r')
+
+
+class TableData(Mapping):
+
+    """A read-only mapping of database entries backed by a table.
+
+    Entries are built from their row on request, so that opening the table
+    does not construct every entry.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._index = {str(key): row for row, key in enumerate(table['key'])}
+
+    def __getitem__(self, key):
+        row = self.table[self._index[key]]
+        if row['alias_of']:
+            return {'alias_of': str(row['alias_of'])}
+
+        states = int(row['states'])
+        entry = {'__ion__': 'Ion',
+                 'name': str(row['name']),
+                 'alias': str(row['alias']).split(_separator)
+                 if row['alias'] else None,
+                 'valence': row['valence'][:states].tolist()}
+        for prop in _state_properties:
+            values = row[prop][:states]
+            entry[prop] = None if np.all(np.isnan(values)) else values.tolist()
+
+        entry['molecular_weight'] = (None if np.isnan(row['molecular_weight'])
+                                     else float(row['molecular_weight']))
+
+        fit = row['nightingale_fit']
+        entry['nightingale_data'] = (None if np.all(np.isnan(fit)) else
+                                     {'fit': fit[~np.isnan(fit)].tolist(),
+                                      'min': float(row['nightingale_min']),
+                                      'max': float(row['nightingale_max'])})
+        return entry
+
+    def targets(self):
+        """Return a dictionary from each key to the entry it refers to."""
+        return {str(key): str(alias_of) or str(key) for key, alias_of in
+                zip(self.table['key'], self.table['alias_of'])}
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
@@ -1,7 +1,6 @@
 """Module containing the BaseIon class."""
 import numpy as np
 import contextlib
-from math import sqrt
 import json
 
 from .fixed_state import fixed_state
@@ -11,6 +10,23 @@ from ..constants import reference_temperature, elementary_charge, lpm3, \
 from ..serialize import _serialize
 
 
+def _canonical(value):
+    """Return a hashable representation of a state value."""
+    if isinstance(value, BaseIon):
+        return value._canonical_key()
+    elif isinstance(value, np.ndarray):
+        return tuple(value.ravel().tolist())
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, dict):
+        return tuple(sorted((key, _canonical(item))
+                            for key, item in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_canonical(item) for item in value)
+    else:
+        return value
+
+
 @fixed_state
 class BaseIon(object):
     """BaseIon is the basic implementation of a ion.
@@ -31,6 +47,11 @@ class BaseIon(object):
 
     _context = None
 
+    # The canonical key and hash are computed from the state on first use.
+    # Ions are immutable, so they are never recomputed.
+    _key = None
+    _hash = None
+
     def __repr__(self):
         """Return an unambiguous string representation."""
         inner = []
@@ -48,24 +69,27 @@ class BaseIon(object):
         """Return a readable string representation."""
         return "{}('{}')".format(type(self).__name__, self.name)
 
+    def _canonical_key(self):
+        """Return a tuple of the state of the ion, for hashing and equality."""
+        if self._key is None:
+            self._key = tuple((prop, _canonical(getattr(self, prop)))
+                              for prop in sorted(self._state))
+        return self._key
+
     def __hash__(self):
         """Return the hash value for the object."""
-        return hash(self.serialize())
+        if self._hash is None:
+            self._hash = hash(self._canonical_key())
+        return self._hash
 
     def __eq__(self, other):
         """Test equality between two ions."""
-        try:
-            assert self._state == other._state
-            for prop in self._state:
-                if isinstance(getattr(self, prop), np.ndarray):
-                    assert getattr(other, prop) is not None
-                    assert(np.all(getattr(self, prop) == getattr(other, prop)))
-                else:
-                    if isinstance(getattr(other, prop), np.ndarray):
-                        assert getattr(self, prop) is not None
-                    assert getattr(self, prop) == getattr(other, prop)
+        if self is other:
             return True
-        except:
+        try:
+            return (hash(self) == hash(other) and
+                    self._canonical_key() == other._canonical_key())
+        except (AttributeError, TypeError):
             return False
 
     def serialize(self, nested=False, compact=False):
@@ -198,7 +222,7 @@ class BaseIon(object):
                                                                   temperature)
                 else:
                     ionic_strength = \
-                        sqrt(self._solvent.dissociation(0., temperature))
+                        np.sqrt(self._solvent.dissociation(0., temperature))
 
         return pH, ionic_strength, temperature
 
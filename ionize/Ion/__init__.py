@@ -5,6 +5,7 @@ import numpy as np
 from .BaseIon import BaseIon
 from ..constants import reference_temperature
 from .fixed_state import fixed_state
+from ..cache import ParameterCache
 
 
 @fixed_state
@@ -70,7 +71,6 @@ class Ion(BaseIon):
     _reference_mobility = None
     _reference_temperature = reference_temperature
     _pKa = None
-    _absolute_mobility = None
     _enthalpy = None
     _heat_capacity = None
     _nightingale_data = None
@@ -80,6 +80,9 @@ class Ion(BaseIon):
     # Polynomial function is a derived parameter.
     _nightingale_function = None
 
+    # Temperature dependent parameters are cached, and shared with copies.
+    _parameter_cache = None
+
     def __init__(self, name, valence, reference_pKa, reference_mobility,
                  reference_temperature=None, enthalpy=None, heat_capacity=None,
                  nightingale_data=None, molecular_weight=None, alias=None):
@@ -128,16 +131,29 @@ class Ion(BaseIon):
             self._nightingale_function = \
                 np.poly1d(self.nightingale_data['fit'])
 
+        self._parameter_cache = ParameterCache()
+
+    def cache_info(self):
+        """Return statistics of the cache of temperature dependent parameters.
+
+        The cache holds the temperature corrected pKa and acidity, and the
+        absolute mobility, at recently used temperatures. It is shared by
+        copies of the ion, including every copy loaded from a Database.
+        """
+        return self._parameter_cache.info()
+
     def _valence_zero(self):
         """Create a list of charge states with 0 inserted."""
         return np.sort(np.append(self.valence, [0]))
 
-    from .acidity import pKa, acidity, _clark_glew_pKa, \
+    from .acidity import pKa, acidity, _temperature_pKa, \
+        _temperature_acidity, _clark_glew_pKa, \
         _clark_glew_acidity, _vant_hoff_acidity, _vant_hoff_pKa
 
     from .ionization import acidity_product, ionization_fraction, charge
 
-    from .mobility import absolute_mobility, actual_mobility, \
+    from .mobility import absolute_mobility, _absolute_mobility, \
+        actual_mobility, \
         mobility, robinson_stokes_mobility, onsager_fuoss_mobility
 
     from .transport import molar_conductivity, diffusivity
@@ -1,33 +1,30 @@
 from __future__ import division
 import warnings
-from math import log, sqrt
 import numpy as np
 
-from ..constants import gas_constant, kelvin, pitts
+from ..constants import gas_constant, kelvin
+from ..cache import temperature_cached
 
 
 def acidity(self, ionic_strength=None, temperature=None):
     """Return the effective acidity constant, Ka, for each valence state.
 
     The value is corrected for ionic strength and temperature using the
-    Debye-Huckel approximation.
+    Debye-Huckel approximation. Ionic strength and temperature may be arrays,
+    in which case the result has shape (..., n_states).
     """
     _, ionic_strength, temperature = \
         self._resolve_context(None, ionic_strength, temperature)
 
-    if self.enthalpy is not None and self.heat_capacity is not None:
-        acidity = self._clark_glew_acidity(temperature)
-    elif self.enthalpy is not None and self.heat_capacity is None:
-        acidity = self._vant_hoff_acidity(temperature)
-    else:
-        if temperature != self.reference_temperature:
-            warnings.warn('No data available to correct pKa for temperature.')
-        acidity = 10**(-self.reference_pKa)
+    acidity = self._temperature_acidity(temperature)
 
-    # Correct for the activity of ion and H+
-    gam_i = self._solvent.activity(self._valence_zero(), ionic_strength, temperature)
-    gam_h = self._solvent.activity(1, ionic_strength, temperature)
-    acidity = acidity * gam_i[1:] / gam_i[:-1] / gam_h
+    # Correct for the activity of ion and H+. The activity of a state with
+    # valence z is the activity of a univalent ion to the power z**2.
+    gam_h = np.asarray(self._solvent.activity(1, ionic_strength,
+                                              temperature))[..., np.newaxis]
+    valence_zero = self._valence_zero()
+    acidity = acidity * gam_h**(valence_zero[1:]**2 -
+                                valence_zero[:-1]**2 - 1)
 
     return acidity
 
@@ -37,11 +34,34 @@ def pKa(self, ionic_strength=None, temperature=None):
     return -np.log10(self.acidity(ionic_strength, temperature))
 
 
+@temperature_cached
+def _temperature_acidity(self, temperature):
+    """Return Ka for each valence state, corrected only for temperature."""
+    return 10.**(-self._temperature_pKa(temperature))
+
+
+@temperature_cached
+def _temperature_pKa(self, temperature):
+    """Return the pKa for each valence state, corrected only for temperature.
+
+    Uses the Clark-Glew correction if enthalpy and heat capacity are
+    available, and the van't Hoff correction if only enthalpy is available.
+    """
+    if self.enthalpy is not None and self.heat_capacity is not None:
+        return self._clark_glew_pKa(temperature)
+    elif self.enthalpy is not None and self.heat_capacity is None:
+        return self._vant_hoff_pKa(temperature)
+    else:
+        if np.any(temperature != self.reference_temperature):
+            warnings.warn('No data available to correct pKa for temperature.')
+        return self.reference_pKa + np.zeros(np.shape(temperature) + (1,))
+
+
 def _vant_hoff_pKa(self, temperature):
-    temperature = kelvin(temperature)
+    temperature = kelvin(np.asarray(temperature)[..., np.newaxis])
     reference_temperature = kelvin(self.reference_temperature)
 
-    if abs(temperature - reference_temperature) > 20:
+    if np.any(abs(temperature - reference_temperature) > 20):
         warnings.warn("Using the van't Hoff correction for dT > 20 deg.")
 
     pKa = (self.reference_pKa -
@@ -55,15 +75,15 @@ def _vant_hoff_acidity(self, temperature):
 
 
 def _clark_glew_pKa(self, temperature):
-    T = kelvin(temperature)
+    T = kelvin(np.asarray(temperature)[..., np.newaxis])
     T_ref = kelvin(self.reference_temperature)
 
-    if abs(T-T_ref) > 100:
+    if np.any(abs(T-T_ref) > 100):
         warnings.warn('Using the Clark-Glew correction for dT > 100 deg.')
 
     pKa = (self._vant_hoff_pKa(temperature) -
            self.heat_capacity /
-           (2.303 * gas_constant) * (T_ref/T - 1 - log(T/T_ref))
+           (2.303 * gas_constant) * (T_ref/T - 1 - np.log(T/T_ref))
            )
 
     return pKa
@@ -6,7 +6,9 @@ def ionization_fraction(self, pH=None, ionic_strength=None, temperature=None):
     """Return the fraction of time the ion is in each valence state.
 
     Value is returned as a numpy array. This array will not sum to 1 due to
-    the fraction of ion in the uncharged state.
+    the fraction of ion in the uncharged state. The pH, ionic strength, and
+    temperature may be arrays, in which case the result has shape
+    (..., n_states).
     """
     pH, ionic_strength, temperature = \
         self._resolve_context(pH, ionic_strength, temperature)
@@ -14,14 +16,16 @@ def ionization_fraction(self, pH=None, ionic_strength=None, temperature=None):
     assert pH is not None, 'Calculation requires a pH.'
 
     # Compute the concentration of H+ from the pH.
-    cH = 10**(-pH)/self._solvent.activity(1, ionic_strength, temperature)
+    cH = (10.**(-np.asarray(pH)) /
+          self._solvent.activity(1, ionic_strength, temperature))
 
     # Calculate the numerator of the function for ionization fraction.
     i_frac_vector = (self.acidity_product(ionic_strength, temperature) *
-                     cH ** self._valence_zero())
+                     cH[..., np.newaxis] ** self._valence_zero())
 
     # Filter out the neutral fraction
-    i_frac = i_frac_vector[self._valence_zero() != 0] / i_frac_vector.sum()
+    i_frac = (i_frac_vector[..., self._valence_zero() != 0] /
+              i_frac_vector.sum(-1)[..., np.newaxis])
 
     return i_frac
 
@@ -32,7 +36,7 @@ def charge(self, pH=None, ionic_strength=None, temperature=None, moment=1):
     :param moment: Control which moment average is returned. Default is 1.
     """
     fraction = self.ionization_fraction(pH, ionic_strength, temperature)
-    return np.sum(fraction * self.valence**moment)
+    return np.sum(fraction * self.valence**moment, -1)
 
 
 def acidity_product(self, ionic_strength=None, temperature=None):
@@ -45,14 +49,14 @@ def acidity_product(self, ionic_strength=None, temperature=None):
     _, ionic_strength, temperature = \
         self._resolve_context(None, ionic_strength, temperature)
 
-    Ka = self.acidity(ionic_strength, temperature).tolist()
     index_0 = list(self._valence_zero()).index(0)
-    Ka.insert(index_0, 1)
+    Ka = np.insert(self.acidity(ionic_strength, temperature), index_0, 1.,
+                   axis=-1)
 
-    Lp = np.cumprod(Ka)
-    Lpp = np.cumprod(Ka[::-1])[::-1]
+    Lp = np.cumprod(Ka, -1)
+    Lpp = np.cumprod(Ka[..., ::-1], -1)[..., ::-1]
     L = np.where(self._valence_zero() >= 0,
-                 Lp[self._valence_zero() == 0] / Lp,
-                 Lpp / Lpp[self._valence_zero() == 0])
+                 Lp[..., index_0:index_0+1] / Lp,
+                 Lpp / Lpp[..., index_0:index_0+1])
 
     return L
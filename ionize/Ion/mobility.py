@@ -1,16 +1,18 @@
 from __future__ import division
-from math import copysign, sqrt
+from math import copysign
 import warnings
 import numpy as np
 
 from ..constants import pitts, reference_temperature, kelvin, faraday, \
     elementary_charge, lpm3, gpkg, onsager_fuoss
+from ..cache import temperature_cached
 
 def mobility(self, pH=None, ionic_strength=None, temperature=None):
     """Return the effective mobility of the ion in m^2/V/s.
 
     If a context solution is available, mobility uses the full Onsager-Fuoss
     correction to mobility. Otherwise, the Robinson-Stokes model is used.
+    The pH, ionic strength, and temperature may be arrays.
 
     :param pH
     :param ionic_strength
@@ -23,7 +25,7 @@ def mobility(self, pH=None, ionic_strength=None, temperature=None):
                                                    temperature)
     actual_mobility = self.actual_mobility(ionic_strength, temperature)
 
-    effective_mobility = np.sum(ionization_fraction * actual_mobility)
+    effective_mobility = np.sum(ionization_fraction * actual_mobility, -1)
 
     return effective_mobility
 
@@ -53,22 +55,29 @@ def absolute_mobility(self, temperature=None):
     """
     _, _, temperature = \
         self._resolve_context(None, None, temperature)
+    return self._absolute_mobility(temperature)
 
+
+@temperature_cached
+def _absolute_mobility(self, temperature):
+    """Return the mobility of each charge state at infinite dilution."""
+    temperature = np.asarray(temperature)
     if self._nightingale_function:
         absolute_mobility = \
-            (self._nightingale_function(temperature).tolist() *
-             10.35e-11 / self._solvent.viscosity(temperature) *
+            (self._nightingale_function(temperature)[..., np.newaxis] *
+             10.35e-11 /
+             self._solvent.viscosity(temperature)[..., np.newaxis] *
              self.valence)
 
-        if not (self.nightingale_data['min'] <
-                temperature <
-                self.nightingale_data['max']):
+        if not np.all((self.nightingale_data['min'] < temperature) &
+                      (temperature < self.nightingale_data['max'])):
             warnings.warn('Temperature outside range'
                           'for nightingale data.')
     else:
         absolute_mobility =\
             (self._solvent.viscosity(self.reference_temperature) /
-             self._solvent.viscosity(temperature)*self.reference_mobility)
+             self._solvent.viscosity(temperature)[..., np.newaxis] *
+             self.reference_mobility)
 
     return absolute_mobility
 
@@ -82,6 +91,10 @@ def robinson_stokes_mobility(self, ionic_strength=None, temperature=None):
     _, ionic_strength, temperature = \
         self._resolve_context(None, ionic_strength, temperature)
 
+    mobility = self.absolute_mobility(temperature)
+
+    ionic_strength = np.asarray(ionic_strength)[..., np.newaxis]
+    temperature = np.asarray(temperature)[..., np.newaxis]
     dielectric = self._solvent.dielectric(temperature)
     viscosity = self._solvent.viscosity(temperature)
 
@@ -91,10 +104,10 @@ def robinson_stokes_mobility(self, ionic_strength=None, temperature=None):
     beta = (3.022588e-9 * abs(self.valence) / viscosity /
             (kelvin(temperature) * dielectric)**(1./2.))
 
-    mobility = self.absolute_mobility(temperature)
-    mobility -= (alpha * mobility +
-                 beta * np.sign(self.valence)) * \
-        (sqrt(2 * ionic_strength) / (1. + pitts * sqrt(2 *ionic_strength)))
+    mobility = mobility - (alpha * mobility +
+                           beta * np.sign(self.valence)) * \
+        (np.sqrt(2 * ionic_strength) /
+         (1. + pitts * np.sqrt(2 * ionic_strength)))
 
     return mobility
 
@@ -104,64 +117,231 @@ def onsager_fuoss_mobility(self):
     _, ionic_strength, temperature = \
         self._resolve_context(None, None, None)
 
-    dielectric = self._solvent.dielectric(temperature)
-    viscosity = self._solvent.viscosity(temperature)
-    interaction = _interaction(self, self.context())
+    return _corrected_mobility(self.absolute_mobility(), self.valence, None,
+                               ionic_strength, self._solvent, temperature,
+                               _interaction(self, self.context()))
 
-    alpha = (1.98074e6 * abs(self.valence) * interaction /
-             (kelvin(temperature) * dielectric)**(3./2.)
-             )
-    beta = (3.022588e-9 * abs(self.valence) / viscosity /
-            (kelvin(temperature) * dielectric)**(1./2.))
 
-    mobility = self.absolute_mobility()
-    mobility -= (alpha * mobility +
-                 beta * np.sign(self.valence)) * \
-        (sqrt(2 * ionic_strength) / (1. + pitts * sqrt(2 *ionic_strength)))
+def _interaction(ion, solution):
+    """Return the Onsager-Fuoss interaction factor for each state of the ion.
 
-    return mobility
+    The factors of the ions in the solution are computed together and cached
+    by the solution. Ions that are not in the solution are added to it at
+    zero concentration.
+    """
+    try:
+        return solution._interaction_factors()[ion]
+    except KeyError:
+        return _solution_interaction(solution, [ion])[ion]
 
 
-def _interaction(ion, solution):
+def _solution_interaction(solution, extra_ions=()):
+    """Return a dict of the interaction factors of each ion in a solution.
+
+    :param solution: The solution. Ions at nonzero concentration, hydroxide,
+    and hydronium are included.
+    :param extra_ions: Additional ions to include at zero concentration.
+    """
     ions = [ion_ for ion_ in solution.ions
             if solution.concentration(ion_) > 0] + \
            [solution._hydroxide,  solution._hydronium]
+    ions = ions + [ion_ for ion_ in extra_ions if ion_ not in ions]
 
-    if ion not in ions:
-        ions = ions + [ion]
-    ion_index = ions.index(ion)
-    if ion_index != 0:
-        start_index = len(np.concatenate([ion_.valence
-                                          for ion_ in ions[:ion_index]]))
-    else:
-        start_index = 0
-    end_index = start_index + len(ion.valence)
-
-    omega = np.concatenate([ion.absolute_mobility() / ion.valence
-                            for ion in ions]) / faraday
+    omega = np.concatenate([ion_.absolute_mobility() / ion_.valence
+                            for ion_ in ions]) / faraday
 
     if np.any(omega == 0.):
         raise RuntimeError('Onsager-Fuoss approximation '
                            'diverges for non-mobile ions. ')
 
-    valences = np.concatenate([ion.valence for ion in ions])
-    concentrations = np.concatenate([solution.concentration(ion) *
-                                     ion.ionization_fraction(solution.pH)
-                                     for ion in ions])
+    valences = np.concatenate([ion_.valence for ion_ in ions])
+    concentrations = np.concatenate([solution.concentration(ion_) *
+                                     ion_.ionization_fraction(solution.pH)
+                                     for ion_ in ions])
 
-    potential = concentrations * valences**2. / (2. * solution.ionic_strength)
+    factor = _interaction_factor(omega, valences, concentrations,
+                                 solution.ionic_strength)
 
-    h = potential * omega / (omega + omega[:, np.newaxis])
-    d = np.diag(np.sum(h, 1))
-    B = 2 * (h + d) - np.identity(len(omega))
+    factors = dict()
+    start_index = 0
+    for ion_ in ions:
+        end_index = start_index + len(ion_.valence)
+        factors[ion_] = factor[start_index:end_index]
+        start_index = end_index
+    return factors
 
-    r = np.zeros([len(omega), 6])
-    r[:, 0] = (valences - (np.sum(valences * potential) /
-                           np.sum(potential / omega)) / omega)
 
-    for i in range(1, 6):
-        r[:, i] = np.dot(B, r[:, i-1])
+def _interaction_factor(omega, valences, concentrations, ionic_strength):
+    """Return the Onsager-Fuoss interaction factor for each charge state.
 
-    factor = np.dot(onsager_fuoss, np.transpose(r))
+    Inputs are arrays over the charge states in the last axis. Leading axes
+    are broadcast, so many solutions can be evaluated at once.
 
-    return factor[start_index:end_index]
+    :param omega: The absolute mobility of each state divided by valence and
+    the Faraday constant.
+    :param valences: The valence of each state.
+    :param concentrations: The concentration of each state.
+    :param ionic_strength: The ionic strength of each solution.
+    """
+    ionic_strength = np.asarray(ionic_strength)[..., np.newaxis]
+    potential = concentrations * valences**2. / (2. * ionic_strength)
+
+    h = (potential * omega)[..., np.newaxis, :] / \
+        (omega[..., np.newaxis, :] + omega[..., :, np.newaxis])
+    identity = np.identity(omega.shape[-1])
+    B = 2 * (h + identity * np.sum(h, -1)[..., np.newaxis]) - identity
+
+    r = (valences - (np.sum(valences * potential, -1) /
+                     np.sum(potential / omega, -1))[..., np.newaxis] / omega)
+    factor = onsager_fuoss[0] * r
+    for coefficient in onsager_fuoss[1:]:
+        r = np.einsum('...ij,...j->...i', B, r)
+        factor = factor + coefficient * r
+
+    return factor
+
+
+def _background_interaction(omega, valences, concentrations, ionic_strength):
+    """Return the state of a solution needed for trace interaction factors.
+
+    Trace states, at vanishing concentration, do not change the interaction
+    factors of the solution. Each term of the series for a trace state
+    depends only on its own mobility and on the terms of the solution's
+    states. Those terms are found once here, for one solution.
+
+    :param omega, valences, concentrations, ionic_strength: As for
+    _interaction_factor, for one solution.
+    """
+    potential = concentrations * valences**2. / (2. * ionic_strength)
+    h = (potential * omega)[np.newaxis, :] / \
+        (omega[np.newaxis, :] + omega[:, np.newaxis])
+    identity = np.identity(omega.size)
+    B = 2 * (h + identity * np.sum(h, -1)[:, np.newaxis]) - identity
+
+    ratio = np.sum(valences * potential) / np.sum(potential / omega)
+    terms = [valences - ratio / omega]
+    for _ in onsager_fuoss[1:-1]:
+        terms.append(np.dot(B, terms[-1]))
+    return {'omega': omega, 'potential': potential, 'ratio': ratio,
+            'terms': terms}
+
+
+def _trace_interaction_factor(background, omega, valences):
+    """Return the Onsager-Fuoss interaction factor of trace charge states.
+
+    Each trace state is evaluated independently against the solution, so the
+    cost is linear in the number of trace states.
+
+    :param background: The state of the solution, from
+    _background_interaction.
+    :param omega: The absolute mobility of each trace state divided by
+    valence and the Faraday constant.
+    :param valences: The valence of each trace state.
+    """
+    h = ((background['potential'] * background['omega'])[np.newaxis, :] /
+         (background['omega'][np.newaxis, :] + omega[:, np.newaxis]))
+    diagonal = 2. * np.sum(h, -1) - 1.
+
+    r = valences - background['ratio'] / omega
+    factor = onsager_fuoss[0] * r
+    for coefficient, term in zip(onsager_fuoss[1:], background['terms']):
+        r = 2. * np.dot(h, term) + diagonal * r
+        factor = factor + coefficient * r
+    return factor
+
+
+def _corrected_mobility(mobility, valences, concentrations, ionic_strength,
+                        solvent, temperature, factor=None):
+    """Return the Onsager-Fuoss corrected mobility of each charge state.
+
+    Inputs are arrays over the charge states in the last axis, as for
+    _interaction_factor, and leading axes are broadcast.
+
+    :param mobility: The absolute mobility of each state.
+    :param valences: The valence of each state.
+    :param concentrations: The concentration of each state.
+    :param ionic_strength: The ionic strength of each solution.
+    :param solvent: The solvent.
+    :param temperature: The temperature of the solutions.
+    :param factor: The interaction factor of each state, if it is already
+    known. Otherwise, it is found from the states.
+    """
+    ionic_strength = np.asarray(ionic_strength)
+    if factor is None:
+        factor = _interaction_factor(mobility / valences / faraday, valences,
+                                     concentrations, ionic_strength)
+
+    alpha, beta, screening = _onsager_fuoss_coefficients(
+        valences, ionic_strength, solvent, temperature)
+    return mobility - (alpha * factor * mobility +
+                       beta * np.sign(valences)) * screening[..., np.newaxis]
+
+
+def _onsager_fuoss_coefficients(valences, ionic_strength, solvent,
+                                temperature):
+    """Return the coefficients of the Onsager-Fuoss mobility correction.
+
+    The corrected mobility of a state is
+    mobility - (alpha * factor * mobility + beta * sign(valence)) * screening,
+    where factor is its interaction factor. Returns alpha and beta for each
+    state, and the screening of each solution.
+    """
+    ionic_strength = np.asarray(ionic_strength)
+    dielectric = solvent.dielectric(temperature)
+    viscosity = solvent.viscosity(temperature)
+    alpha = (1.98074e6 * abs(valences) /
+             (kelvin(temperature) * dielectric)**(3./2.))
+    beta = (3.022588e-9 * abs(valences) / viscosity /
+            (kelvin(temperature) * dielectric)**(1./2.))
+    screening = (np.sqrt(2 * ionic_strength) /
+                 (1. + pitts * np.sqrt(2 * ionic_strength)))
+    return alpha, beta, screening
+
+
+def _interaction_factor_tangent(omega, valences, concentrations,
+                                ionic_strength, d_omega, d_concentrations,
+                                d_ionic_strength):
+    """Return the interaction factors and their directional derivatives.
+
+    This is the forward derivative of _interaction_factor for a single
+    solution, evaluated along many directions at once.
+
+    :param omega, valences, concentrations, ionic_strength: As for
+    _interaction_factor, for one solution.
+    :param d_omega: The change in omega along each direction, shape (D, S).
+    :param d_concentrations: The change in the concentration of each state
+    along each direction, shape (D, S).
+    :param d_ionic_strength: The change in the ionic strength along each
+    direction, shape (D,).
+    """
+    d_ionic_strength = np.asarray(d_ionic_strength)[:, np.newaxis]
+    potential = concentrations * valences**2. / (2. * ionic_strength)
+    d_potential = (d_concentrations * valences**2. / (2. * ionic_strength) -
+                   potential * d_ionic_strength / ionic_strength)
+
+    pair = omega[np.newaxis, :] + omega[:, np.newaxis]
+    d_pair = d_omega[:, np.newaxis, :] + d_omega[:, :, np.newaxis]
+    h = (potential * omega)[np.newaxis, :] / pair
+    d_h = ((d_potential * omega + potential * d_omega)[:, np.newaxis, :] -
+           h * d_pair) / pair
+    identity = np.identity(omega.size)
+    B = 2 * (h + identity * np.sum(h, -1)[:, np.newaxis]) - identity
+    d_B = 2 * (d_h + identity * np.sum(d_h, -1)[..., np.newaxis])
+
+    s, t = np.sum(valences * potential), np.sum(potential / omega)
+    d_s = np.sum(valences * d_potential, -1)
+    d_t = np.sum(d_potential / omega - potential * d_omega / omega**2, -1)
+    k, d_k = s / t, (d_s - s / t * d_t) / t
+
+    r = valences - k / omega
+    d_r = -d_k[:, np.newaxis] / omega + k * d_omega / omega**2
+    factor = onsager_fuoss[0] * r
+    d_factor = onsager_fuoss[0] * d_r
+    for coefficient in onsager_fuoss[1:]:
+        d_r = (np.einsum('dij,j->di', d_B, r) +
+               np.einsum('ij,dj->di', B, d_r))
+        r = np.dot(B, r)
+        factor = factor + coefficient * r
+        d_factor = d_factor + coefficient * d_r
+
+    return factor, d_factor
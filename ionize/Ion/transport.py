@@ -14,13 +14,13 @@ def molar_conductivity(self, pH=None, ionic_strength=None, temperature=None):
         self._resolve_context(pH, ionic_strength, temperature)
 
     m_conductivity = (lpm3 * faraday *
-                      sum(self.valence *
-                          self.ionization_fraction(pH,
-                                                   ionic_strength,
-                                                   temperature) *
-                          self.actual_mobility(ionic_strength,
-                                               temperature)
-                          )
+                      np.sum(self.valence *
+                             self.ionization_fraction(pH,
+                                                      ionic_strength,
+                                                      temperature) *
+                             self.actual_mobility(ionic_strength,
+                                                  temperature), -1
+                             )
                       )
 
     return m_conductivity
@@ -43,8 +43,7 @@ def diffusivity(self, pH=None, ionic_strength=None, temperature=None):
 
     diffusivity = np.sum(actual_mobility *
                          ionization_fraction /
-                         self.valence *
-                         boltzmann * kelvin(temperature) /
-                         elementary_charge) / \
-        np.sum(ionization_fraction)
+                         self.valence, -1) * \
+        boltzmann * kelvin(temperature) / elementary_charge / \
+        np.sum(ionization_fraction, -1)
     return diffusivity
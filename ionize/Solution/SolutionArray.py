@@ -0,0 +1,327 @@
+"""Module containing the SolutionArray class."""
+from __future__ import division
+import copy
+import warnings
+import numpy as np
+
+from ..Ion import BaseIon
+from ..Ion.mobility import _corrected_mobility
+from ..Solvent import Aqueous
+from ..Database import Database
+from ..constants import reference_temperature, kelvin, faraday, lpm3, \
+    boltzmann, elementary_charge
+from .equilibrium import _acidity_table, _batch_equilibrium
+
+database = Database()
+
+
+class SolutionArray(object):
+
+    """Represent many aqueous Solutions that share a set of ions.
+
+    A SolutionArray equilibrates every composition at once, using array
+    operations across the rows, rather than one Solution at a time. The
+    physics match the Solution class.
+
+    :param ions: An iterable of ion objects, or strings. Each string is
+    converted to an ion object using the ionize database.
+
+    :param concentrations: An array of concentrations in moles per liter, with
+    one row per solution and one column per ion, shape (N, M) for M ions. A
+    single row may be given as a flat sequence.
+
+    :param temperature: The temperature of each solution in Celsius. May be a
+    single value or one value per row.
+
+    Example:
+        ``sols = ionize.SolutionArray(['tris', 'chloride'],
+                                     [[0.1, 0.05], [0.1, 0.08]])
+        sols.pH, sols.ionic_strength
+        sols.conductivity()
+        sols[0]  # Solution(ions=['tris', 'hydrochloric acid'], ...)``
+    """
+
+    _solvent = Aqueous
+    _hydronium = None
+    _hydroxide = None
+
+    _ions = tuple()
+    _concentrations = None
+    _temperature = None
+    _pH = None
+    _ionic_strength = None
+    _dissociation = None
+
+    # Fraction of each ion in each charge state, by temperature group.
+    _fractions = None
+
+    # Charged states and corrected mobilities, by temperature group.
+    _state_cache = None
+
+    @property
+    def ions(self):
+        """Return a tuple of the ions shared by the solutions."""
+        return self._ions
+
+    @property
+    def concentrations(self):
+        """Return the array of ion concentrations, one row per solution."""
+        return self._concentrations
+
+    @property
+    def pH(self):
+        """The pH of each solution."""
+        return self._pH
+
+    @property
+    def ionic_strength(self):
+        """The ionic strength of each solution."""
+        return self._ionic_strength
+
+    def __init__(self, ions, concentrations, temperature=None):
+        """Initialize a SolutionArray object."""
+        if isinstance(ions, (str, BaseIon)):
+            ions = (ions,)
+
+        ions = [database.load(ion) if isinstance(ion, str) else copy.copy(ion)
+                for ion in ions]
+
+        for ion in ions:
+            if not hasattr(ion, 'valence'):
+                raise TypeError('SolutionArray requires ions with '
+                                'discrete valence states. '
+                                '{} has none.'.format(ion))
+        self._ions = tuple(ions)
+
+        concentrations = np.array(concentrations, dtype=float, ndmin=2)
+        if concentrations.ndim != 2 or concentrations.shape[-1] != len(ions):
+            raise ValueError('Concentrations must have one row per solution '
+                             'and one column per ion, shape (N, {}). Got '
+                             'shape {}.'.format(len(ions),
+                                                concentrations.shape))
+        if np.any(concentrations < 0):
+            raise ValueError('Concentrations must be positive.')
+        self._concentrations = concentrations
+
+        if temperature is None:
+            temperature = reference_temperature
+        self._temperature = np.broadcast_to(np.array(temperature, dtype=float),
+                                            (len(self),)).copy()
+
+        self._hydronium = database['hydronium']
+        self._hydroxide = database['hydroxide']
+
+        self._equilibrate()
+
+    @classmethod
+    def _from_equilibrium(cls, ions, concentrations, temperature, pH,
+                          ionic_strength, dissociation, fractions):
+        """Return a SolutionArray whose equilibrium is already known.
+
+        The equilibrium is taken as given, rather than solved again.
+
+        :param ions: Ions with discrete charge states.
+        :param concentrations: The concentrations, shape (N, M).
+        :param temperature: The temperature of each solution.
+        :param pH, ionic_strength, dissociation: The equilibrium of each
+        solution, as from _batch_equilibrium.
+        :param fractions: A dict from each temperature to the valence table
+        and the state fractions of its rows, as in _equilibrate.
+        """
+        new_array = cls.__new__(cls)
+        new_array._ions = tuple(copy.copy(ion) for ion in ions)
+        new_array._concentrations = np.array(concentrations, dtype=float)
+        new_array._temperature = np.array(temperature, dtype=float)
+        new_array._hydronium = database['hydronium']
+        new_array._hydroxide = database['hydroxide']
+        new_array._pH = np.array(pH, dtype=float)
+        new_array._ionic_strength = np.array(ionic_strength, dtype=float)
+        new_array._dissociation = np.array(dissociation, dtype=float)
+        new_array._fractions = dict(fractions)
+        new_array._state_cache = dict()
+        return new_array
+
+    def temperature(self):
+        """Return the temperature of each solution."""
+        return self._temperature
+
+    def _groups(self):
+        """Yield the temperature and row index of each temperature group."""
+        for temperature in np.unique(self._temperature):
+            yield temperature, np.flatnonzero(self._temperature == temperature)
+
+    def _derive(self, concentrations):
+        """Return a new SolutionArray derived from this one.
+
+        The new array has the same ions and temperatures, and the same number
+        of rows. Its equilibrium is warm started from the equilibrium of this
+        array.
+        """
+        new_array = copy.copy(self)
+        new_array._concentrations = np.array(concentrations, dtype=float)
+        assert new_array._concentrations.shape == self._concentrations.shape, \
+            'The derived array must have the same shape.'
+        if np.any(new_array._concentrations < 0):
+            raise ValueError('Concentrations must be positive.')
+        new_array._equilibrate(guess=(self._pH, self._ionic_strength))
+        return new_array
+
+    def _equilibrate(self, guess=None):
+        """Compute the equilibrium pH and ionic strength of every row.
+
+        :param guess: An optional (pH, ionic_strength) pair of arrays, with a
+        value for each row, to warm start the equilibrium.
+        """
+        self._pH = np.zeros(len(self))
+        self._ionic_strength = np.zeros(len(self))
+        self._dissociation = np.zeros(len(self))
+        self._fractions = dict()
+        self._state_cache = dict()
+
+        for temperature, rows in self._groups():
+            valence, log_L0, activity_L = _acidity_table(self.ions,
+                                                         temperature)
+            pH, ionic_strength, dissociation, fractions, _ = \
+                _batch_equilibrium(self._solvent, valence, log_L0,
+                                   activity_L, self.concentrations[rows],
+                                   temperature,
+                                   guess=None if guess is None else
+                                   (guess[0][rows], guess[1][rows]))
+
+            self._pH[rows] = pH
+            self._ionic_strength[rows] = ionic_strength
+            self._dissociation[rows] = dissociation
+            self._fractions[temperature] = (valence, fractions)
+
+        if np.any(self._ionic_strength > 1.):
+            warnings.warn(('Ionic strength > 1M. '
+                           'Ionic stregth correction may be inaccurate.'))
+
+    def _cH(self):
+        """Return the concentration of protons in each solution."""
+        return 10**(-self.pH) / self._solvent.activity(1., self.ionic_strength,
+                                                       self._temperature)
+
+    def _cOH(self):
+        """Return the concentration of hydroxyls in each solution."""
+        return self._dissociation / self._cH() / \
+            self._solvent.activity(1., self.ionic_strength,
+                                   self._temperature)**2.
+
+    def _state_mobilities(self, temperature, rows):
+        """Return the charged states of a temperature group, and mobilities.
+
+        Returns the valence of each charged state, the ion that each state
+        belongs to, the concentration of each state in each row, and the
+        Onsager-Fuoss corrected mobility of each state in each row. The states
+        of the ions are followed by hydroxide and hydronium, which are owned
+        by no ion. The states are cached for each temperature, so that the
+        conductivity, mobility, and diffusivity share them.
+        """
+        if temperature in self._state_cache:
+            return self._state_cache[temperature]
+
+        valence, fractions = self._fractions[temperature]
+        water = (self._hydroxide, self._hydronium)
+        water_valence, _, _ = _acidity_table(water, temperature)
+        charged = valence != 0
+        cH, cOH = self._cH()[rows], self._cOH()[rows]
+
+        # Water ions are fully ionized at any realistic pH.
+        state_valence = np.concatenate([valence[charged],
+                                        water_valence[water_valence != 0]])
+        owner = np.concatenate([np.nonzero(charged)[0], [-1, -1]])
+        state_mobility = np.concatenate(
+            [ion.absolute_mobility(temperature)
+             for ion in self.ions + water])
+        concentrations = np.concatenate(
+            [(self.concentrations[rows, :, np.newaxis] *
+              fractions)[:, charged],
+             cOH[:, np.newaxis], cH[:, np.newaxis]], -1)
+
+        mobility = _corrected_mobility(state_mobility, state_valence,
+                                       concentrations,
+                                       self.ionic_strength[rows],
+                                       self._solvent, temperature)
+        self._state_cache[temperature] = (state_valence, owner,
+                                          concentrations, mobility)
+        return self._state_cache[temperature]
+
+    def conductivity(self):
+        """Return the electrical conductivity of each solution, in S/m.
+
+        Uses the Onsager-Fuoss correction to mobility, as Solution does.
+        """
+        conductivity = np.zeros(len(self))
+        for temperature, rows in self._groups():
+            valence, _, concentrations, mobility = \
+                self._state_mobilities(temperature, rows)
+            conductivity[rows] = lpm3 * faraday * \
+                np.sum(concentrations * valence * mobility, -1)
+
+        return conductivity
+
+    def mobility(self):
+        """Return the effective mobility of each ion in each solution.
+
+        The effective mobility is the fraction weighted mobility of the states
+        of the ion, in m^2/V/s, with one row per solution and one column per
+        ion, as for Ion.mobility.
+        """
+        mobility = np.zeros(self.concentrations.shape)
+        for temperature, rows in self._groups():
+            valence, fractions = self._fractions[temperature]
+            _, owner, _, state_mobility = \
+                self._state_mobilities(temperature, rows)
+            charged = fractions[:, valence != 0]
+            for j in range(len(self.ions)):
+                mobility[rows, j] = np.sum((charged * state_mobility[:, :-2])
+                                           [:, owner[:-2] == j], -1)
+        return mobility
+
+    def diffusivity(self):
+        """Return the diffusivity of each ion in each solution, in m^2/s.
+
+        Each charged state diffuses according to the Nernst-Einstein relation,
+        weighted by its share of the ionized fraction, as for
+        Ion.diffusivity.
+        """
+        diffusivity = np.zeros(self.concentrations.shape)
+        for temperature, rows in self._groups():
+            valence, fractions = self._fractions[temperature]
+            state_valence, owner, _, state_mobility = \
+                self._state_mobilities(temperature, rows)
+            charged = fractions[:, valence != 0]
+            weighted = (charged * state_mobility[:, :-2] /
+                        state_valence[:-2])
+            for j in range(len(self.ions)):
+                states = owner[:-2] == j
+                diffusivity[rows, j] = (np.sum(weighted[:, states], -1) /
+                                        np.sum(charged[:, states], -1))
+        return diffusivity * boltzmann * kelvin(self._temperature)[
+            :, np.newaxis] / elementary_charge
+
+    def __len__(self):
+        return self._concentrations.shape[0]
+
+    def __getitem__(self, index):
+        """Return a row as a Solution object."""
+        from . import Solution
+        solution = Solution(self.ions, self.concentrations[index])
+        solution.temperature(self._temperature[index])
+        return solution
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def __repr__(self):
+        """Return a representation of the SolutionArray."""
+        template = "SolutionArray(ions={}, concentrations={}, temperature={})"
+        return template.format([ion.name for ion in self.ions],
+                               self.concentrations.tolist(),
+                               self._temperature.tolist())
+
+    def __str__(self):
+        """Return a string representing the SolutionArray."""
+        return "SolutionArray({} solutions, {} ions)".format(len(self),
+                                                            len(self.ions))
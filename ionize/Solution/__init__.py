@@ -18,7 +18,8 @@ class Solution(object):
     """Represent an aqueous Solution.
 
     Solutions automatically compute their equilibrium state, and store it
-    as pH and ionic_strength.
+    as pH and ionic_strength. The equilibrium is computed when it is first
+    needed, and is remembered for each temperature.
 
     :param ions: An iterable of ion objects, or strings. Each string is
     converted to an ion object using the ionize database. If ion objects are
@@ -28,6 +29,12 @@ class Solution(object):
 
     :param concentrations: An iterable of concentrations, in moles per liter.
 
+    :param solver: The method used to find the pH. 'polynomial' solves for the
+    roots of the charge balance polynomial. 'charge_balance' uses bracketed
+    root finding on the charge balance in log space, which scales linearly
+    with the number of species. If None, the polynomial method is used for
+    solutions with up to 10 ions, and the charge balance method otherwise.
+
     Example:
         ``sol = ionize.Solution(['chloride', 'tris'], [0.02, 0.05])
         sol.pH, sol.ionic_strength
@@ -48,14 +55,36 @@ class Solution(object):
     _ionic_strength = 0.    # Expected in molar.
     _temperature = reference_temperature  # Temperature in C
 
+    # The equilibrium is solved lazily. _stale marks that _pH and
+    # _ionic_strength are out of date. _equilibria stores the (pH, I) found at
+    # each temperature, and _guess is an optional warm start for the solver.
+    _stale = True
+    _equilibria = None
+    _guess = None
+
+    # Onsager-Fuoss interaction factors, the background for trace ions, and
+    # the properties snapshot, cached with the (pH, I, T) state.
+    _interaction_cache = None
+    _background_cache = None
+    _properties_cache = None
+
+    # The pH solver. If None, the solver is selected by the number of ions.
+    _solvers = ('polynomial', 'charge_balance')
+    _solver = None
+    _polynomial_limit = 10
+
     # Ions and concentrations fully represent state.
     # class uses _contents internally to enforce consistency
     # and help with lookups
     _state = ('ions', 'concentrations')
     _contents = OrderedDict()
 
-    @property
-    def _name_lookup(self):
+    # Map from each ion name and alias to the ion. _index_names rebuilds it
+    # whenever the ions in _contents change.
+    _name_lookup = dict()
+
+    def _index_names(self):
+        """Rebuild the name lookup from the ions in the solution."""
         name_lookup = dict()
         for ion in self.ions:
             name_lookup[ion.name] = ion
@@ -68,7 +97,7 @@ class Solution(object):
         name_lookup['OH-'] = self._hydroxide
         name_lookup['hydronium'] = self._hydronium
         name_lookup['hydroxide'] = self._hydroxide
-        return name_lookup
+        self._name_lookup = name_lookup
 
     @property
     def ions(self):
@@ -83,16 +112,25 @@ class Solution(object):
     @property
     def pH(self):
         """The pH of the solution."""
+        self._update_equilibrium()
         return self._pH
 
     @property
     def ionic_strength(self):
         """The ionic strength of the solution."""
+        self._update_equilibrium()
         return self._ionic_strength
 
-    def __init__(self, ions=[], concentrations=[]):
+    def __init__(self, ions=[], concentrations=[], solver=None):
         """Initialize a solution object."""
 
+        if solver is not None and solver not in self._solvers:
+            raise ValueError('Solver must be one of {}.'.format(self._solvers))
+        self._solver = solver
+        self._set_contents(ions, concentrations)
+
+    def _set_contents(self, ions, concentrations):
+        """Set the ions and concentrations of the solution."""
         if isinstance(ions, (str, BaseIon)):
             ions = (ions,)
 
@@ -124,10 +162,72 @@ class Solution(object):
         self._hydroxide.context(self)
 
         for solvent_component in self._hydroxide, self._hydronium:
-            assert solvent_component not in self.ions, \
+            assert solvent_component not in self._contents, \
                 "Solvent components cannot be manually added to Solution."
 
-        self._equilibrate()
+        self._index_names()
+        self._invalidate()
+
+    def _derive(self, ions, concentrations):
+        """Return a new Solution derived from this one.
+
+        The new solution has the same temperature and solver. Its equilibrium
+        is warm started from the equilibrium of this solution.
+        """
+        new_solution = Solution.__new__(Solution)
+        new_solution._solver = self._solver
+        new_solution._temperature = self._temperature
+        new_solution._set_contents(ions, concentrations)
+        new_solution._guess = self._warm_start()
+        return new_solution
+
+    def _update_equilibrium(self):
+        """Equilibrate the solution if the equilibrium is out of date."""
+        if not self._stale:
+            return
+
+        if self._temperature in self._equilibria:
+            self._pH, self._ionic_strength = \
+                self._equilibria[self._temperature]
+            self._stale = False
+        else:
+            try:
+                self._equilibrate(guess=self._guess)
+            except:
+                self._stale = True
+                raise
+
+    def _invalidate(self):
+        """Mark the equilibrium out of date after a change in composition.
+
+        The last known equilibrium is kept as a warm start.
+        """
+        self._guess = self._warm_start()
+        self._equilibria = dict()
+        self._interaction_cache = None
+        self._background_cache = None
+        self._properties_cache = None
+        self._stale = True
+
+    def _warm_start(self):
+        """Return the best available (pH, ionic_strength) estimate."""
+        if self._stale:
+            return self._guess
+        else:
+            return (self._pH, self._ionic_strength)
+
+    @classmethod
+    def batch(cls, ions, concentrations, temperature=None):
+        """Return a SolutionArray of many solutions that share a set of ions.
+
+        Every row of concentrations is equilibrated at once.
+
+        :param ions: An iterable of ion objects, or strings.
+        :param concentrations: An array of concentrations, with one row per
+        solution and one column per ion.
+        :param temperature: The temperature of each solution.
+        """
+        return SolutionArray(ions, concentrations, temperature)
 
     def temperature(self, temperature=None):
         """Set or get the temperature of the solution.
@@ -141,8 +241,9 @@ class Solution(object):
         else:
             old_temperature = self._temperature
             if temperature != old_temperature:
+                self._guess = self._warm_start()
                 self._temperature = float(temperature)
-                self._equilibrate()
+                self._stale = True
 
             @contextlib.contextmanager
             def manage_temperature():
@@ -151,6 +252,16 @@ class Solution(object):
 
             return manage_temperature()
 
+    def _pH_solver(self):
+        """Return the name of the pH solver used for this solution."""
+        if self._solver is not None:
+            return self._solver
+        elif len([ion for ion in self.ions if hasattr(ion, 'valence')]) > \
+                self._polynomial_limit:
+            return 'charge_balance'
+        else:
+            return 'polynomial'
+
     def _cH(self):
         """Return the concentration of protons in solution."""
         cH = 10**(-self.pH)/self._solvent.activity(1, self.ionic_strength,
@@ -182,33 +293,28 @@ class Solution(object):
     def __add__(self, other):
         if isinstance(other, Solution):
             ions = list(set(self.ions + other.ions))
-            new_solution = Solution(ions, [self.concentration(ion) +
-                                   other.concentration(ion)
-                                   for ion in ions]
-                            )
+            return self._derive(ions, [self.concentration(ion) +
+                                       other.concentration(ion)
+                                       for ion in ions])
         else:
             try:
                 ion, concentration = other
                 new_contents = dict(self._contents)
                 new_contents[ion] = self.concentration(ion) + concentration
-                new_solution = Solution(new_contents.keys(), new_contents.values())
+                return self._derive(new_contents.keys(),
+                                    new_contents.values())
             except:
                 raise TypeError('Solutions add to other Solutions or to an'
                                  '(Ion, concentration) iterable pair.')
-        
-        # Update the temperature of the new solution to match this one.
-        new_solution.temperature(self._temperature)
-        return new_solution
 
     __radd__ = __add__
 
     def __sub__(self, other):
         if isinstance(other, Solution):
             ions = list(set(self.ions + other.ions))
-            new_solution = Solution(ions, [self.concentration(ion) -
-                                   other.concentration(ion)
-                                   for ion in ions]
-                            )
+            return self._derive(ions, [self.concentration(ion) -
+                                       other.concentration(ion)
+                                       for ion in ions])
         else:
             try:
                 ion, concentration = other
@@ -216,38 +322,27 @@ class Solution(object):
                 new_contents[ion] = self.concentration(ion) - concentration
                 if new_contents[ion]==0:
                     del new_contents[ion]
-                new_solution = Solution(new_contents.keys(), new_contents.values())
+                return self._derive(new_contents.keys(),
+                                    new_contents.values())
             except:
                 raise TypeError('Solutions add to other Solutions or to an'
                                  '(Ion, concentration) iterable pair.')
-            
-        # Update the temperature of the new solution to match this one.
-        new_solution.temperature(self._temperature)
-        return new_solution
 
     def __mul__(self, other):
         if other >= 0:
-            new_solution = Solution(self.ions,
-                            [c * other for c in self.concentrations])
+            return self._derive(self.ions,
+                                [c * other for c in self.concentrations])
         else:
             raise TypeError
-        
-        # Update the temperature of the new solution to match this one.
-        new_solution.temperature(self._temperature)
-        return new_solution
 
     __rmul__ = __mul__
 
     def __truediv__(self, other):
         if other > 0:
-            new_solution = Solution(self.ions,
-                            [c / other for c in self.concentrations])
+            return self._derive(self.ions,
+                                [c / other for c in self.concentrations])
         else:
             raise TypeError
-        
-        # Update the temperature of the new solution to match this one.
-        new_solution.temperature(self._temperature)
-        return new_solution
 
     def __str__(self):
         """Return a string representing the Solution."""
@@ -273,7 +368,10 @@ class Solution(object):
         return hash(self.serialize())
 
     def __contains__(self, other):
-        return other in self.ions or other in self._name_lookup.keys()
+        try:
+            return other in self._contents or other in self._name_lookup
+        except TypeError:
+            return False
 
     def __iter__(self):
         return (ion for ion in self.ions)
@@ -294,10 +392,10 @@ class Solution(object):
         conductivity contributed by H+ and OH- is less
         than 10% the sum of charge contributed by other ions.
         """
-        diss = sum([self.concentration(ion) * self[ion].molar_conductivity()
-                    for ion in ('H+', 'OH-')])
-        other = sum([self.concentration(ion) * ion.molar_conductivity()
-                     for ion in self.ions])
+        properties = self.properties()
+        diss = (properties['hydronium_conductivity'] +
+                properties['hydroxide_conductivity'])
+        other = sum(self.concentrations * properties['molar_conductivity'])
         return 10. * diss < other
 
     def moderate(self):
@@ -309,8 +407,7 @@ class Solution(object):
         """
         diss = sum([abs(self.concentration(ion) * self[ion].charge())
                     for ion in ('H+', 'OH-')])
-        other = sum([abs(self.concentration(ion) * ion.charge())
-                     for ion in self.ions])
+        other = sum(abs(self.concentrations * self.properties()['charge']))
         return 10. * diss < other
 
     def serialize(self, nested=False, compact=False):
@@ -327,9 +424,17 @@ class Solution(object):
 
     from .equilibrium import _equilibrate
     from .conductivity import conductivity, hydroxide_conductivity, \
-        hydronium_conductivity
-    from .titrate import titrate, buffering_capacity, \
-        equilibrate_CO2, displace
+        hydronium_conductivity, _interaction_factors, _background
+    from .titrate import titrate, titrate_multi, titration_curve, \
+        equilibrate_CO2, co2_sweep, displace
+    from .derivatives import buffering_capacity, pH_derivatives, \
+        sensitivities
+    from .properties import properties
     from .debye import debye
     from .transference import transference, zone_transfer
     from .conservation import kohlrausch, alberty, jovin, gas
+    from .isotachophoresis import itp_train
+    from .electropherogram import electropherogram
+
+
+from .SolutionArray import SolutionArray
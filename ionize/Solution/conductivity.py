@@ -1,12 +1,47 @@
+import numpy as np
+
+from ..constants import faraday
+from ..Ion.mobility import _solution_interaction, _background_interaction
+
+
+def _interaction_factors(self):
+    """Return the Onsager-Fuoss interaction factors of the solution's ions.
+
+    The factors for every charge state are computed in one pass, and cached
+    against the current pH, ionic strength, and temperature. Returns a dict
+    from each ion to the factors of its charge states.
+    """
+    state = (self.pH, self.ionic_strength, self.temperature())
+    if self._interaction_cache is None or self._interaction_cache[0] != state:
+        self._interaction_cache = (state, _solution_interaction(self))
+    return self._interaction_cache[1]
+
+
+def _background(self):
+    """Return the state of the solution for trace interaction factors.
+
+    The state is cached against the current pH, ionic strength, and
+    temperature, like the interaction factors of the solution's ions.
+    """
+    state = (self.pH, self.ionic_strength, self.temperature())
+    if self._background_cache is None or self._background_cache[0] != state:
+        ions = [ion for ion in self.ions if self.concentration(ion) > 0] + \
+            [self._hydroxide, self._hydronium]
+        omega = np.concatenate([ion.absolute_mobility() / ion.valence
+                                for ion in ions]) / faraday
+        valences = np.concatenate([ion.valence for ion in ions])
+        concentrations = np.concatenate(
+            [self.concentration(ion) * ion.ionization_fraction(self.pH)
+             for ion in ions])
+        self._background_cache = (state, _background_interaction(
+            omega, valences, concentrations, self.ionic_strength))
+    return self._background_cache[1]
+
+
 def conductivity(self):
     """Return the electrical conductivity of the solution, in Seimens/meter.
     """
-    conduct = 0
-    for c, i in zip(self.concentrations, self.ions):
-        conduct += c * i.molar_conductivity()
-
-    conduct += self.hydronium_conductivity() + self.hydroxide_conductivity()
-    return conduct
+    return self.properties()['conductivity']
 
 
 def hydronium_conductivity(self):
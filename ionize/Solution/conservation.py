@@ -12,13 +12,15 @@ def kohlrausch(self):
     case.
     """
     KRF = 0
+    properties = self.properties()
 
-    for ion in self.ions:
+    for ion, c, fraction, mobility in zip(self.ions, self.concentrations,
+                                          properties['ionization_fraction'],
+                                          properties['mobility']):
 
-        z_eff = (np.mean([z*f for z, f in
-                 zip(ion.valence, ion.ionization_fraction())]))
-        KRF += abs(z_eff) * self.concentration(ion) * lpm3 / ion.mobility()
-        if max(ion.ionization_fraction()) < .9:
+        z_eff = np.mean(ion.valence * fraction)
+        KRF += abs(z_eff) * c * lpm3 / mobility
+        if max(fraction) < .9:
             warnings.warn('ions are not fully ionized. KRF is a poor approx.')
 
     return KRF
@@ -31,17 +33,19 @@ def alberty(self):
     cannot be neglected.
     """
     al = 0
+    properties = self.properties()
 
-    for ion, c in zip(self.ions, self.concentrations):
+    for ion, c, f, actual_mobility in zip(self.ions, self.concentrations,
+                                          properties['ionization_fraction'],
+                                          properties['actual_mobility']):
         if len(ion.reference_mobility) == 1:
-            al += c * lpm3 / abs(ion.actual_mobility()[0])
+            al += c * lpm3 / abs(actual_mobility[0])
         else:
-            f = ion.ionization_fraction()
             if max(f)/sum(f) < .9:
                 warnings.warn('Ion not in single valance. Alberty invalid.')
             elif abs(ion.valence[f.argmax()]) != 1:
                 warnings.warn('Ion valance is not 1. Alberty invalid.')
-            al += c * lpm3 / abs(ion.actual_mobility()[f.argmax()])
+            al += c * lpm3 / abs(actual_mobility[f.argmax()])
 
     return al
 
@@ -54,11 +58,11 @@ def jovin(self):
     """
     jov = 0
 
-    for ion, c in zip(self.ions, self.concentrations):
+    for ion, c, f in zip(self.ions, self.concentrations,
+                         self.properties()['ionization_fraction']):
         if len(ion.reference_mobility) == 1:
             jov += c * ion.valence[0]
         else:
-            f = ion.ionization_fraction()
             if max(f)/sum(f) < .9:
                 warnings.warn('Ion not in single valance. Jovin invalid.')
             # elif abs(ion.valence[f.index(max(f))]) != 1:
@@ -0,0 +1,268 @@
+from __future__ import division
+from math import log, sqrt
+import numpy as np
+
+from ..constants import lpm3, faraday, pitts
+from ..Ion.mobility import _interaction_factor_tangent, \
+    _onsager_fuoss_coefficients
+from .equilibrium import _acidity_table, _state_fractions, \
+    _log_acidity_product
+
+
+def _equilibrium_system(self):
+    """Return the equilibrium equations of the solution, linearized.
+
+    The equilibrium is the root of two equations in x = ln(cH) and the ionic
+    strength, I. G1 is the charge balance, and G2 is I minus the ionic
+    strength computed from the ionization state. Returns a dict with the
+    Jacobian of (G1, G2) with respect to (x, I), the derivatives of (G1, G2)
+    with respect to the concentration of each ion, and the intermediate
+    values used to find them.
+    """
+    temperature = self.temperature()
+    ionic_strength = self.ionic_strength
+    ions = [ion for ion in self.ions if hasattr(ion, 'valence')]
+    concentrations = np.array([self.concentration(ion) for ion in ions])
+
+    # The log activity of a univalent ion, g, and its slope with I.
+    g = log(self._solvent.activity(1, ionic_strength, temperature), 10)
+    root = sqrt(ionic_strength)
+    g_slope = 0.1 - (self._solvent.debye_huckel(temperature) /
+                     (2. * root * (1. + pitts * root)**2.))
+
+    valence, log_L, activity_L = _acidity_table(ions, temperature)
+    log_L = log(10.) * (log_L + activity_L * g)
+    x = log(self._cH())
+    fractions = _state_fractions(valence, log_L, x)
+
+    def mean(values):
+        return np.sum(fractions * values, -1)
+
+    charge, moment2 = mean(valence), mean(valence**2)
+    mean_activity = mean(activity_L)
+    charge_x = moment2 - charge**2
+    moment2_x = mean(valence**3) - moment2 * charge
+    charge_g = log(10.) * (mean(valence * activity_L) -
+                           charge * mean_activity)
+    moment2_g = log(10.) * (mean(valence**2 * activity_L) -
+                            moment2 * mean_activity)
+
+    # The charge balance uses the activity corrected dissociation, Kw/gamma^2,
+    # while the ionic strength uses the hydroxide concentration of Solution,
+    # which carries another factor of 1/gamma^2.
+    cH = np.exp(x)
+    cOH = self._solvent.dissociation(ionic_strength, temperature) / cH
+    cOH_I = self._cOH()
+
+    jacobian = np.array(
+        [[np.sum(concentrations * charge_x) + cH + cOH,
+          g_slope * (np.sum(concentrations * charge_g) +
+                     2. * log(10.) * cOH)],
+         [-(np.sum(concentrations * moment2_x) + cH - cOH_I) / 2.,
+          1. - g_slope * (np.sum(concentrations * moment2_g) -
+                          4. * log(10.) * cOH_I) / 2.]])
+
+    # Derivatives with respect to the concentration of each ion. Ions without
+    # discrete charge states only contribute to the ionic strength.
+    partials = np.zeros((2, len(self.ions)))
+    index = 0
+    for j, ion in enumerate(self.ions):
+        if hasattr(ion, 'valence'):
+            partials[:, j] = charge[index], -moment2[index] / 2.
+            index += 1
+        else:
+            partials[1, j] = -ion.charge(moment=2) / 2.
+
+    return {'x': x, 'g_slope': g_slope, 'jacobian': jacobian,
+            'partials': partials, 'ions': ions,
+            'concentrations': concentrations, 'valence': valence,
+            'activity_L': activity_L, 'fractions': fractions,
+            'charge': charge, 'cH': cH, 'cOH': cOH_I}
+
+
+def _equilibrium_response(system, partials):
+    """Return the change in (pH, ionic strength, x) for each parameter.
+
+    :param system: The linearized equilibrium, from _equilibrium_system.
+    :param partials: The derivatives of (G1, G2) with respect to each
+    parameter, shape (2, n).
+    """
+    dx, dI = np.linalg.solve(system['jacobian'], -partials)
+    dpH = -(dx / log(10.) + system['g_slope'] * dI)
+    return dpH, dI, dx
+
+
+def pH_derivatives(self):
+    """Return the derivative of the pH with respect to each concentration.
+
+    The derivatives are found exactly, from the implicit derivative of the
+    equilibrium equations at the current equilibrium, in the order of the
+    ions in the solution, in pH units per molar.
+    """
+    system = _equilibrium_system(self)
+    return _equilibrium_response(system, system['partials'])[0]
+
+
+def buffering_capacity(self):
+    """Return the buffering capacity of the solution.
+
+    The buffering capacity is the concentration of a strong acid needed to
+    lower the pH by one unit, in the limit of a small addition. It is found
+    exactly from the implicit derivative of the equilibrium equations.
+    """
+    # A fully ionized monovalent acid adds -1 to the charge balance and 1/2
+    # to the ionic strength for each mole added.
+    system = _equilibrium_system(self)
+    dpH = _equilibrium_response(system, np.array([[-1.], [-.5]]))[0]
+    return float(-1. / dpH[0])
+
+
+def sensitivities(self):
+    """Return the derivatives of the solution properties with its inputs.
+
+    The derivatives of the pH, the ionic strength, the conductivity, and the
+    effective mobility of each ion are found with respect to the concentration
+    of each ion, and the reference pKa and reference mobility of each charge
+    state of each ion. The equilibrium is differentiated implicitly, so all of
+    the derivatives are found with one linear solve, without equilibrating new
+    solutions.
+
+    Returns a dict with the keys 'pH', 'ionic_strength', 'conductivity', and
+    'mobility', the effective mobility of each ion. Each entry is a dict with
+    the following entries, in the order of the ions in the solution. The
+    entries for 'mobility' have a leading axis over the ions whose mobility is
+    differentiated.
+
+    concentration: The derivative with respect to the concentration of each
+    ion, in molar.
+
+    pKa: The derivative with respect to the reference pKa of each charge
+    state of each ion.
+
+    mobility: The derivative with respect to the reference mobility of each
+    charge state of each ion, in m^2/V/s. Ions with mobilities from
+    Nightingale data do not depend on their reference mobility.
+
+    Sensitivities require ions with discrete charge states.
+    """
+    for ion in self.ions:
+        if not hasattr(ion, 'valence'):
+            raise TypeError('Sensitivities require ions with discrete '
+                            'charge states.')
+
+    system = _equilibrium_system(self)
+    ions, c = system['ions'], system['concentrations']
+    valence, fractions = system['valence'], system['fractions']
+    g_slope = system['g_slope']
+    temperature, ionic_strength = self.temperature(), self.ionic_strength
+    n = len(ions)
+    lengths = [len(ion.valence) for ion in ions]
+    n_states = sum(lengths)
+
+    # The inputs are the concentrations, the pKas, and the mobilities. The
+    # conductivity also depends on x = ln(cH) and I, which are appended for
+    # its derivatives at fixed equilibrium.
+    pKa_start, mobility_start = n, n + n_states
+    size = n + 2 * n_states
+    X, I = size, size + 1
+
+    # The pKa of each state changes the log acidity product of the ion that
+    # owns it, and so its fractions in each state.
+    owner = np.repeat(np.arange(n), lengths)
+    d_log_L = np.zeros((n_states, valence.shape[1]))
+    k = 0
+    for ion in ions:
+        valence_zero = ion._valence_zero()
+        for unit in -np.identity(len(ion.valence)):
+            d_log_L[k, :valence_zero.size] = \
+                log(10.) * _log_acidity_product(unit, valence_zero)
+            k += 1
+    f = fractions[owner]
+    d_fractions = f * (d_log_L - np.sum(f * d_log_L, -1)[:, np.newaxis])
+
+    partials = np.zeros((2, size))
+    partials[:, :n] = system['partials']
+    partials[0, pKa_start:mobility_start] = \
+        c[owner] * np.sum(d_fractions * valence[owner], -1)
+    partials[1, pKa_start:mobility_start] = \
+        -c[owner] * np.sum(d_fractions * valence[owner]**2, -1) / 2.
+
+    dpH, dI, dx = _equilibrium_response(system, partials)
+
+    # Tabulate the charged states of each ion, then hydronium and hydroxide,
+    # with the derivatives of their fractions and absolute mobilities.
+    states = [(j, column) for j, ion in enumerate(ions)
+              for column in np.nonzero(ion._valence_zero() != 0)[0]]
+    z = np.array([valence[state] for state in states] + [1., -1.])
+    mu0 = np.concatenate([ion._absolute_mobility(temperature)
+                          for ion in ions + [self._hydronium,
+                                             self._hydroxide]])
+    f = np.array([fractions[state] for state in states], dtype=float)
+    d_f = np.zeros((size + 2, len(states)))
+    d_mu0 = np.zeros((size + 2, z.size))
+    mean_activity = np.sum(fractions * system['activity_L'], -1)
+    for s, (j, column) in enumerate(states):
+        d_f[pKa_start:mobility_start, s] = \
+            (owner == j) * d_fractions[:, column]
+        d_f[X, s] = f[s] * (z[s] - system['charge'][j])
+        d_f[I, s] = (f[s] * log(10.) * g_slope *
+                     (system['activity_L'][j, column] - mean_activity[j]))
+
+        # Mobilities from Nightingale data ignore the reference mobility.
+        if not ions[j]._nightingale_function:
+            d_mu0[mobility_start + s, s] = \
+                (self._solvent.viscosity(ions[j].reference_temperature) /
+                 self._solvent.viscosity(temperature))
+
+    # Each state holds its fraction of the concentration of its ion.
+    member = np.array([j for j, _ in states], dtype=int)
+    C = np.concatenate([c[member] * f, [system['cH'], system['cOH']]])
+    d_C = np.zeros((size + 2, z.size))
+    d_C[:, :-2] = c[member] * d_f
+    d_C[member, np.arange(len(states))] += f
+    d_C[X, -2:] = system['cH'], -system['cOH']
+    d_C[I, -1] = -4. * log(10.) * g_slope * system['cOH']
+    d_I = np.zeros(size + 2)
+    d_I[I] = 1.
+
+    factor, d_factor = _interaction_factor_tangent(
+        mu0 / z / faraday, z, C, ionic_strength,
+        d_mu0 / z / faraday, d_C, d_I)
+
+    # Differentiate the Onsager-Fuoss corrected mobility of each state.
+    alpha, beta, screening = _onsager_fuoss_coefficients(
+        z, ionic_strength, self._solvent, temperature)
+    root = sqrt(2 * ionic_strength)
+    d_screening = 1. / (root * (1. + pitts * root)**2.)
+
+    relaxation = alpha * factor * mu0 + beta * np.sign(z)
+    mobility = mu0 - relaxation * screening
+    d_mobility = (d_mu0 * (1. - alpha * factor * screening) -
+                  alpha * mu0 * screening * d_factor -
+                  np.outer(d_I, relaxation * d_screening))
+    d_conductivity = lpm3 * faraday * np.sum(z * (d_C * mobility +
+                                                  C * d_mobility), -1)
+    d_conductivity = (d_conductivity[:size] + d_conductivity[X] * dx +
+                      d_conductivity[I] * dI)
+
+    # The effective mobility of each ion is the fraction weighted mobility of
+    # its states.
+    d_effective = np.zeros((size + 2, n))
+    np.add.at(d_effective.T, member, (d_f * mobility[:-2] +
+                                      f * d_mobility[:, :-2]).T)
+    d_effective = (d_effective[:size] +
+                   np.outer(dx, d_effective[X]) + np.outer(dI, d_effective[I]))
+
+    bounds = list(zip(np.cumsum([0] + lengths[:-1]), np.cumsum(lengths)))
+
+    def split(values):
+        return {'concentration': values[..., :n],
+                'pKa': tuple(values[..., pKa_start + start:pKa_start + end]
+                             for start, end in bounds),
+                'mobility': tuple(values[..., mobility_start + start:
+                                         mobility_start + end]
+                                  for start, end in bounds)}
+
+    return {'pH': split(dpH), 'ionic_strength': split(dI),
+            'conductivity': split(d_conductivity),
+            'mobility': split(d_effective.T)}
@@ -0,0 +1,130 @@
+from __future__ import division
+import numpy as np
+
+from ..constants import faraday, boltzmann, elementary_charge, kelvin
+from ..Ion.mobility import _trace_interaction_factor, _corrected_mobility
+from ..Database import Database
+from .equilibrium import _acidity_table, _state_fractions
+
+database = Database()
+
+
+def electropherogram(self, analytes, length, voltage, eof_mobility=0.,
+                     detector=None, injection_length=0.):
+    """Return the predicted electropherogram of analytes in the solution.
+
+    The solution is the background electrolyte, and each analyte is taken to
+    be at trace concentration. The mobility of every analyte with discrete
+    charge states is found in one pass against the cached state of the
+    background electrolyte, with the full Onsager-Fuoss correction, as for
+    analyte.mobility() in the context of the solution. Other analytes, such as
+    Peptides and NucleicAcids, use their own mobility model at the pH and
+    ionic strength of the solution.
+
+    Each peak is Gaussian. Its variance in space is the variance of the
+    injected plug plus the variance from diffusion during migration.
+
+    Returns a dict with the following entries, in the order of the analytes.
+
+    mobility: The effective mobility of each analyte, in m^2/V/s.
+
+    diffusivity: The diffusivity of each analyte, in m^2/s.
+
+    velocity: The apparent velocity of each analyte, including
+    electroosmotic flow, in m/s.
+
+    time: The migration time of each analyte to the detector, the position of
+    its peak in the electropherogram, in s. Analytes that never reach the
+    detector have an infinite time.
+
+    width: The standard deviation of each peak in time, in s.
+
+    resolution: The resolution of each pair of analytes, the difference in
+    migration time over twice the sum of the peak widths. NaN for pairs with
+    an analyte that is not detected.
+
+    :param analytes: An iterable of ions or names.
+    :param length: The length of the capillary, in m.
+    :param voltage: The applied voltage, in V. Positive voltage moves cations
+    toward the detector.
+    :param eof_mobility: The electroosmotic mobility, in m^2/V/s.
+    :param detector: The distance from the inlet to the detector, in m.
+    Defaults to the length of the capillary.
+    :param injection_length: The length of the injected plug, in m.
+    """
+    analytes = [database[analyte] if isinstance(analyte, str) else analyte
+                for analyte in analytes]
+    detector = length if detector is None else detector
+    temperature = self.temperature()
+    pH, ionic_strength = self.pH, self.ionic_strength
+
+    mobility, diffusivity = np.zeros(len(analytes)), np.zeros(len(analytes))
+    small = [index for index, analyte in enumerate(analytes)
+             if hasattr(analyte, 'valence')]
+    if small:
+        mobility[small], diffusivity[small] = \
+            _trace_transport(self, [analytes[index] for index in small])
+
+    for index, analyte in enumerate(analytes):
+        if not hasattr(analyte, 'valence'):
+            mobility[index] = analyte.mobility(pH, ionic_strength,
+                                               temperature)
+            diffusivity[index] = analyte.diffusivity(pH, ionic_strength,
+                                                     temperature)
+
+    field = voltage / length
+    velocity = (mobility + eof_mobility) * field
+    with np.errstate(divide='ignore'):
+        time = np.where(velocity > 0, detector / velocity, np.inf)
+    detected = np.isfinite(time)
+
+    variance = injection_length**2 / 12. + \
+        2. * diffusivity * np.where(detected, time, 0.)
+    width = np.where(detected, np.sqrt(variance) / np.abs(velocity), np.nan)
+
+    with np.errstate(invalid='ignore'):
+        resolution = (np.abs(time[:, np.newaxis] - time[np.newaxis, :]) /
+                      (2. * (width[:, np.newaxis] + width[np.newaxis, :])))
+    return {'mobility': mobility,
+            'diffusivity': diffusivity,
+            'velocity': velocity,
+            'time': time,
+            'width': width,
+            'resolution': resolution}
+
+
+def _trace_transport(self, analytes):
+    """Return the mobility and diffusivity of trace analytes in the solution.
+
+    Every charge state of every analyte is evaluated at once.
+
+    :param analytes: Ions with discrete charge states.
+    """
+    temperature = self.temperature()
+    ionic_strength = self.ionic_strength
+
+    valence, log_L, activity_L = _acidity_table(analytes, temperature)
+    log_gamma = np.log10(self._solvent.activity(1., ionic_strength,
+                                                temperature))
+    log_L = np.log(10.) * (log_L + activity_L * log_gamma)
+    fractions = _state_fractions(valence, log_L, np.log(self._cH()))
+
+    charged = valence != 0
+    owner = np.nonzero(charged)[0]
+    state_valence = valence[charged]
+    absolute = np.concatenate([analyte.absolute_mobility(temperature)
+                               for analyte in analytes])
+    factor = _trace_interaction_factor(self._background(),
+                                       absolute / state_valence / faraday,
+                                       state_valence)
+    state_mobility = _corrected_mobility(absolute, state_valence, None,
+                                         ionic_strength, self._solvent,
+                                         temperature, factor)
+
+    f = fractions[charged]
+    mobility = np.bincount(owner, f * state_mobility, len(analytes))
+    diffusivity = (np.bincount(owner, f * state_mobility / state_valence,
+                               len(analytes)) /
+                   np.bincount(owner, f, len(analytes)) *
+                   boltzmann * kelvin(temperature) / elementary_charge)
+    return mobility, diffusivity
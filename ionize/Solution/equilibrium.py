@@ -1,6 +1,6 @@
 from __future__ import division
 import numpy as np
-from math import log10, sqrt
+from math import log, log10, sqrt
 from scipy.optimize import newton, brentq
 import warnings
 
@@ -20,17 +20,52 @@ def _calculate_ionic_strength(self, pH, guess):
 
 
 def _calculate_pH(self, ionic_strength):
+    """Return the pH that satisfies the charge balance at an ionic strength.
+
+    Dispatches to the polynomial or the charge balance solver, depending on
+    the solver selected for the solution.
+    """
+    if self._pH_solver() == 'polynomial':
+        return _polynomial_pH(self, ionic_strength)
+    else:
+        return _charge_balance_pH(self, ionic_strength)
+
+
+def _charge_balance_pH(self, ionic_strength):
+    """Return the pH by root finding on the charge balance in log(cH).
+
+    The cost of each evaluation is linear in the number of charge states, and
+    the method remains well conditioned for solutions with many species.
+    """
+    ions = [ion for ion in self.ions if hasattr(ion, 'valence')]
+    temperature = self.temperature()
+
+    valence, log_L, activity_L = _acidity_table(ions, temperature)
+    log_gamma = log10(self._solvent.activity(1, ionic_strength, temperature))
+    log_L = log(10.) * (log_L + activity_L * log_gamma)
+    concentrations = np.array([self.concentration(ion) for ion in ions])
+    dissociation = self._solvent.dissociation(ionic_strength, temperature)
+
+    # The last pH evaluated is a good initial guess.
+    guess = -log(10.) * (self._pH + log_gamma)
+    log_cH = _solve_charge_balance(valence, log_L, concentrations,
+                                   dissociation, guess=guess)
+
+    return float(-(log_cH / log(10.) + log_gamma))
+
+
+def _polynomial_pH(self, ionic_strength):
     # Find the order of the polynomial. This is the maximum
-    # size of the list of charge states in an ion.
+    # size of the list of charge states in an ion, including the neutral state.
     ions = [ion for ion in self.ions if hasattr(ion, 'valence')]
-    max_columns = max([max(ion.valence)-min(ion.valence)+2
-                       for ion in ions])
+    max_columns = max([len(ion._valence_zero()) for ion in ions])
     n_ions = len(ions)
 
     # Set up the matrix of Ls, the multiplication
-    # of acidity coefficients for each ion.
-    l_matrix = np.array([np.resize(ion.acidity_product(ionic_strength),
-                        [max_columns])
+    # of acidity coefficients for each ion. Pad with zeros, so that ions with
+    # fewer states do not add spurious terms to the polynomial.
+    l_matrix = np.array([_pad(ion.acidity_product(ionic_strength),
+                              max_columns)
                         for ion in ions])
     concentrations = np.array([self.concentration(ion) for ion in ions])
 
@@ -47,7 +82,7 @@ def _calculate_pH(self, ionic_strength):
     # Construct P matrix
     PMat = []
     for i, ion in enumerate(ions):
-        z_list = np.resize(ion._valence_zero(), [max_columns])
+        z_list = _pad(ion._valence_zero(), max_columns)
 
         Mmod = l_matrix.copy()
         Mmod[i, :] *= np.array(z_list)
@@ -89,6 +124,11 @@ def _calculate_pH(self, ionic_strength):
     return pH
 
 
+def _pad(vector, length):
+    """Return the vector, padded with zeros to the length."""
+    return np.pad(vector, (0, length - len(vector)))
+
+
 def equilibrium_offset(I_i, self):
     """Return the error in ionic strength.
 
@@ -103,20 +143,8 @@ def equilibrium_offset(I_i, self):
     return res
 
 
-def _equilibrate(self):
-    """Return the equilibrium ionic strength and pH.
-
-    Uses the newton's method root finder from scipy.optimize to find the
-    equilibrium pH and ionic strength of a solution, using the ionic-strength
-    adjusted activity coefficients. This function is called when the selfect is
-    initialized.
-    """
-    if not [ion for ion in self.ions if hasattr(ion, 'valence')]:
-        dissociation = self._solvent.dissociation(0, self.temperature())
-        self._pH = -log10(sqrt(dissociation))
-        self._ionic_strength = _calculate_ionic_strength(self, self.pH, 0)
-        return
-
+def _bracketed_equilibrium(self):
+    """Return the equilibrium ionic strength, found from a bracket."""
     # Generate an initial ionic strength guess without activity corrections
     I = _calculate_ionic_strength(self, _calculate_pH(self, 0), 0)
 
@@ -137,6 +165,65 @@ def _equilibrate(self):
         I = newton(equilibrium_offset, I, args=(self,))
         warnings.warn('Couldn\'t use the brentq method. Using newton.')
 
+    return I
+
+
+def _local_equilibrium(self, guess, max_iterations=10):
+    """Return the equilibrium ionic strength, found from a nearby guess.
+
+    Uses the secant form of Newton's method, starting from the guess. Returns
+    None if the iteration does not converge to a positive ionic strength.
+    """
+    self._pH, I = guess
+    if not I > 0:
+        return None
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            I, r = newton(equilibrium_offset, I, args=(self,), tol=2e-12,
+                          rtol=4 * np.finfo(float).eps,
+                          maxiter=max_iterations, full_output=True,
+                          disp=False)
+    except (RuntimeError, ValueError, ZeroDivisionError):
+        return None
+
+    if r.converged and I > 0:
+        return I
+    else:
+        return None
+
+
+def _equilibrate(self, guess=None):
+    """Return the equilibrium ionic strength and pH.
+
+    Uses the newton's method root finder from scipy.optimize to find the
+    equilibrium pH and ionic strength of a solution, using the ionic-strength
+    adjusted activity coefficients. This function is called when the selfect is
+    initialized.
+
+    :param guess: An optional (pH, ionic_strength) pair, typically the
+    equilibrium of a closely related solution. If given, a local Newton
+    iteration is tried first, and the bracketed search is used only if it
+    fails.
+    """
+    # The state is updated in place while solving.
+    self._stale = False
+
+    if not [ion for ion in self.ions if hasattr(ion, 'valence')]:
+        dissociation = self._solvent.dissociation(0, self.temperature())
+        self._pH = -log10(sqrt(dissociation))
+        self._ionic_strength = _calculate_ionic_strength(self, self.pH, 0)
+        self._equilibria[self._temperature] = (self._pH, self._ionic_strength)
+        return
+
+    I = None
+    if guess is not None:
+        I = _local_equilibrium(self, guess)
+
+    if I is None:
+        I = _bracketed_equilibrium(self)
+
     # Use this final ionic strength to find the correct pH.
     pH = _calculate_pH(self, I)
 
@@ -157,3 +244,267 @@ def _equilibrate(self):
 
     self._pH = pH
     self._ionic_strength = I
+    self._equilibria[self._temperature] = (pH, I)
+
+
+def _log_acidity_product(log_acidity, valence_zero):
+    """Return the base-10 log of the acidity product for each state.
+
+    This is the logarithmic form of Ion.acidity_product. Because the map from
+    log acidities to log acidity products is linear, it is also used to map
+    activity exponents. The last axis holds the valence states.
+    """
+    index_0 = list(valence_zero).index(0)
+    log_acidity = np.insert(log_acidity, index_0, 0., axis=-1)
+
+    Lp = np.cumsum(log_acidity, -1)
+    Lpp = np.cumsum(log_acidity[..., ::-1], -1)[..., ::-1]
+    return np.where(valence_zero >= 0,
+                    Lp[..., index_0:index_0+1] - Lp,
+                    Lpp - Lpp[..., index_0:index_0+1])
+
+
+def _acidity_table(ions, temperature):
+    """Return padded tables of the charge states of a list of ions.
+
+    Returns the valence of each state (including the neutral state), the
+    log10 acidity product at zero ionic strength, and the coefficient that
+    multiplies the log10 activity of a univalent ion to give the ionic
+    strength correction to the log10 acidity product. Padded states have a
+    log acidity product of -inf, so they never carry concentration.
+    """
+    n_states = max([len(ion.valence) for ion in ions] or [0]) + 1
+    valence = np.zeros((len(ions), n_states))
+    log_L = np.full((len(ions), n_states), -np.inf)
+    activity_L = np.zeros((len(ions), n_states))
+
+    for j, ion in enumerate(ions):
+        valence_zero = ion._valence_zero()
+        n = valence_zero.size
+        valence[j, :n] = valence_zero
+        log_L[j, :n] = _log_acidity_product(-ion._temperature_pKa(temperature),
+                                            valence_zero)
+        activity_L[j, :n] = _log_acidity_product(valence_zero[1:]**2 -
+                                                 valence_zero[:-1]**2 - 1,
+                                                 valence_zero)
+    return valence, log_L, activity_L
+
+
+def _state_fractions(valence, log_L, log_cH):
+    """Return the fraction of each ion in each charge state.
+
+    :param valence: The valence of each state, shape (M, S).
+    :param log_L: The natural log of the activity corrected acidity product,
+    shape (..., M, S).
+    :param log_cH: The natural log of the proton concentration, shape (...).
+    """
+    weights = log_L + valence * np.asarray(log_cH)[..., np.newaxis,
+                                                    np.newaxis]
+    weights = np.exp(weights - _state_reduce(np.maximum,
+                                             weights)[..., np.newaxis])
+    return weights / _state_reduce(np.add, weights)[..., np.newaxis]
+
+
+def _state_reduce(function, values):
+    """Return the reduction of the values over the states, in the last axis.
+
+    There are few states, and reducing the columns one by one is much faster
+    than reducing along a short last axis, for many ions.
+    """
+    result = values[..., 0]
+    for column in range(1, values.shape[-1]):
+        result = function(result, values[..., column])
+    return result
+
+
+def _solve_charge_balance(valence, log_L, concentrations, dissociation,
+                          guess=None, tolerance=1e-13, max_iterations=200,
+                          fixed=None):
+    """Return the natural log of cH that satisfies the charge balance.
+
+    The net charge of the solution is monotone in log(cH), so the root is
+    found by Newton's method, safeguarded by bisection of a bracket. Each
+    evaluation is linear in the number of charge states.
+
+    :param valence: The valence of each state, shape (M, S).
+    :param log_L: The natural log of the activity corrected acidity product,
+    shape (..., M, S).
+    :param concentrations: The total concentration of each ion, shape (..., M).
+    :param dissociation: The activity corrected water dissociation, shape (...).
+    :param guess: An optional initial guess for log(cH), shape (...).
+    :param fixed: An optional boolean mask of ions whose neutral state, rather
+    than total, concentration is given, shape (M,). The totals of these ions
+    follow from _neutral_totals.
+    """
+    dissociation = np.asarray(dissociation, dtype=float)
+    if fixed is None:
+        fixed = np.zeros(valence.shape[0], dtype=bool)
+    capacity = np.sum(np.where(fixed, 0., concentrations) *
+                      np.max(np.abs(valence), -1), -1)
+    bound = capacity + 2. * np.sqrt(dissociation)
+    lo = np.log(dissociation / bound)
+    hi = np.log(bound)
+
+    if np.any(fixed):
+        # A fixed ion has no bound on its charge. Its charge at the ends of
+        # the bracket is a power of cH, so the bracket is widened until each
+        # charged state carries at most a share of the balance.
+        z = valence[fixed]
+        neutral = (concentrations[..., fixed, np.newaxis] *
+                   np.exp(log_L[..., fixed, :]))
+        shares = 1 + np.count_nonzero(z)
+        K = dissociation[..., np.newaxis, np.newaxis]
+        with np.errstate(divide='ignore', over='ignore'):
+            acid = np.where(z < 0, (shares * -z * neutral) **
+                            (1. / (1. - z)), 0.)
+            base = np.where(z > 0, (shares * z * neutral * K**z) **
+                            (1. / (1. + z)), 0.)
+        bound = shares * bound
+        lo = np.log(dissociation / (bound + np.sum(base, (-2, -1))))
+        hi = np.log(bound + np.sum(acid, (-2, -1)))
+
+    if guess is None:
+        x = 0.5 * np.log(dissociation) + np.zeros_like(lo)
+    else:
+        x = np.clip(guess, lo, hi)
+
+    for _ in range(max_iterations):
+        fractions = _state_fractions(valence, log_L, x)
+        charge = _state_reduce(np.add, fractions * valence)
+        moment2 = _state_reduce(np.add, fractions * valence**2)
+        variance = moment2 - charge**2
+
+        # The total of a fixed ion grows with its charge, so its slope is the
+        # second moment of the charge, rather than the variance.
+        totals = _neutral_totals(valence, log_L, concentrations, fractions,
+                                 fixed)
+        cH = np.exp(x)
+        cOH = dissociation / cH
+        net = np.sum(totals * charge, -1) + cH - cOH
+        slope = (np.sum(totals * np.where(fixed, moment2, variance), -1) +
+                 cH + cOH)
+
+        lo = np.where(net < 0, x, lo)
+        hi = np.where(net > 0, x, hi)
+        x_new = x - net / slope
+        x_new = np.where((x_new < lo) | (x_new > hi), (lo + hi) / 2., x_new)
+        x_new = np.where(net == 0, x, x_new)
+
+        converged = np.all(np.abs(x_new - x) < tolerance)
+        x = x_new
+        if converged:
+            break
+    else:
+        warnings.warn('Charge balance did not converge.')
+
+    return x
+
+
+def _neutral_totals(valence, log_L, concentrations, fractions, fixed=None):
+    """Return the total concentration of each ion from its neutral state.
+
+    :param valence: The valence of each state, shape (M, S).
+    :param log_L: The natural log of the activity corrected acidity product,
+    shape (..., M, S).
+    :param concentrations: The concentration of the neutral state of each
+    ion, shape (..., M).
+    :param fractions: The fraction of each ion in each state, shape
+    (..., M, S).
+    :param fixed: An optional boolean mask of the ions to convert. Other ions
+    are returned unchanged.
+    """
+    if fixed is not None and not np.any(fixed):
+        return concentrations
+
+    # Padded states are also uncharged, but never carry concentration.
+    neutral = (valence == 0) & np.isfinite(log_L)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        totals = concentrations / _state_reduce(np.add,
+                                                np.where(neutral, fractions,
+                                                         0.))
+    if fixed is None:
+        return totals
+    return np.where(fixed, totals, concentrations)
+
+
+def _batch_equilibrium(solvent, valence, log_L0, activity_L, concentrations,
+                       temperature, fixed=None, guess=None, tolerance=1e-12,
+                       max_iterations=100):
+    """Return the equilibrium of many solutions of the same ions.
+
+    The pH is found from the charge balance, then the ionic strength is
+    updated from the resulting ionization state until it is self consistent.
+
+    Returns the pH, the ionic strength, the activity corrected dissociation of
+    water, the fraction of each ion in each state, and the total
+    concentration of each ion.
+
+    :param solvent: The solvent.
+    :param valence, log_L0, activity_L: The table of the ions, from
+    _acidity_table.
+    :param concentrations: The concentration of each ion, shape (N, M).
+    :param temperature: The temperature of the solutions.
+    :param fixed: An optional boolean mask of the ions whose concentration
+    is the concentration of their neutral state, such as a dissolved gas.
+    :param guess: An optional (pH, ionic_strength) pair of arrays, typically
+    the equilibrium of nearby solutions, to start the iteration from.
+    """
+    if fixed is None:
+        fixed = np.zeros(valence.shape[0], dtype=bool)
+
+    # Like Solution, pure water does not iterate on ionic strength.
+    water = ~np.any(concentrations > 0, -1)
+
+    ionic_strength = np.zeros(len(concentrations))
+    log_cH, converged, previous = None, False, None
+    if guess is not None:
+        pH, ionic_strength = (np.array(value, dtype=float)
+                              for value in guess)
+        ionic_strength[water] = 0.
+        log_cH = -np.log(10.) * (pH + np.log10(
+            solvent.activity(1., ionic_strength, temperature)))
+    for iteration in range(max_iterations + 1):
+        log_gamma = np.log10(solvent.activity(1., ionic_strength,
+                                              temperature))
+        log_L = np.log(10.) * (log_L0 + activity_L *
+                               log_gamma[:, np.newaxis, np.newaxis])
+        dissociation = solvent.dissociation(ionic_strength, temperature)
+        log_cH = _solve_charge_balance(valence, log_L, concentrations,
+                                       dissociation, guess=log_cH,
+                                       fixed=fixed)
+        fractions = _state_fractions(valence, log_L, log_cH)
+        totals = _neutral_totals(valence, log_L, concentrations, fractions,
+                                 fixed)
+
+        # The last pass recomputes the state at the converged ionic strength.
+        if iteration == max_iterations:
+            warnings.warn('Ionic strength did not converge.')
+        if iteration == max_iterations or converged:
+            break
+
+        cH = np.exp(log_cH)
+        cOH = dissociation / cH / 10**(2. * log_gamma)
+        new_ionic_strength = (np.sum(totals *
+                                     _state_reduce(np.add,
+                                                   fractions * valence**2),
+                                     -1) +
+                              cH + cOH) / 2.
+        new_ionic_strength = np.where(water & (ionic_strength > 0),
+                                      ionic_strength, new_ionic_strength)
+
+        residual = new_ionic_strength - ionic_strength
+        converged = np.all(np.abs(residual) <= tolerance * new_ionic_strength)
+
+        # The fixed point iteration converges linearly, so it is accelerated
+        # with a secant step in each row, where the secant step is sound.
+        step = new_ionic_strength
+        if previous is not None and not converged:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                secant = ionic_strength - residual * (
+                    (ionic_strength - previous[0]) / (residual - previous[1]))
+            step = np.where(np.isfinite(secant) & (secant > 0), secant, step)
+        previous = ionic_strength, residual
+        ionic_strength = step
+
+    pH = -(log_cH / np.log(10.) + log_gamma)
+    return pH, ionic_strength, dissociation, fractions, totals
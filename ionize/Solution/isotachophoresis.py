@@ -0,0 +1,144 @@
+from __future__ import division
+import warnings
+import numpy as np
+from scipy.optimize import root
+
+from ..constants import lpm3
+from ..Database import Database
+
+database = Database()
+
+
+def itp_train(self, leading, analytes, trailing):
+    """Return the adjusted zones of an isotachophoresis train.
+
+    The solution is the leading electrolyte. Each analyte displaces the ion
+    ahead of it, starting with the leading ion, and the trailing ion displaces
+    the last analyte. Every zone moves at the velocity of the leading ion in
+    the leading electrolyte.
+
+    Each zone depends only on the zone ahead of it, so the zones are solved in
+    order, each warm started from the zone ahead. Returns a list of Solutions,
+    with one zone for each analyte, followed by the trailing zone.
+
+    :param leading: The leading ion, which must be in the solution.
+    :param analytes: An iterable of analyte ions, in order of decreasing
+    mobility.
+    :param trailing: The trailing ion.
+    """
+    leading, trailing = (database[ion] if isinstance(ion, str) else ion
+                         for ion in (leading, trailing))
+    analytes = [database[ion] if isinstance(ion, str) else ion
+                for ion in analytes]
+    assert leading in self, 'The leading ion is not present.'
+
+    velocity = _zone_velocity(self, leading)
+    zones, receding, previous = [], leading, self
+    for advancing in analytes + [trailing]:
+        assert advancing not in previous, \
+            'The advancing ion is already present.'
+        previous = _adjusted_zone(previous, receding, advancing, velocity)
+        zones.append(previous)
+        receding = advancing
+    return zones
+
+
+def _zone_velocity(self, ion):
+    """Return the velocity of the ion per current density, 1/zone_transfer."""
+    properties = self.properties()
+    return (lpm3 * properties['mobility'][self.ions.index(ion)] /
+            properties['conductivity'])
+
+
+def _adjusted_zone(previous, receding, advancing, velocity, guess=None):
+    """Return the zone formed when an ion displaces another.
+
+    The advancing ion replaces the receding ion, and moves at the velocity.
+    The other ions satisfy continuity across the moving boundary. The
+    residuals are differentiated analytically, with sensitivities().
+
+    :param previous: The solution being displaced.
+    :param receding: The ion being displaced.
+    :param advancing: The ion that displaces it, or None.
+    :param velocity: The velocity of the boundary, per current density.
+    :param guess: An optional guess of the concentration of each ion of the
+    zone. The ions of the previous zone come first, without the receding
+    ion, followed by the advancing ion.
+    """
+    ions = [ion for ion in previous.ions if ion != receding]
+    if advancing is not None:
+        ions.append(advancing)
+
+    properties = previous.properties()
+    retained = [previous.ions.index(ion) for ion in ions
+                if ion is not advancing]
+    speed = lpm3 * properties['mobility'][retained] / \
+        properties['conductivity']
+    flux = previous.concentrations[retained] * (speed - velocity)
+
+    # The flux scales the residuals, unless it is zero, when the ion moves
+    # with the boundary.
+    scale = np.where(flux != 0, flux, previous.concentrations[retained] *
+                     (abs(speed) + abs(velocity)))
+
+    if guess is None:
+        guess = [previous.concentration(ion) for ion in ions]
+        if advancing is not None:
+            guess[-1] = previous.concentration(receding)
+    state = {'guess': previous._warm_start()}
+
+    # Ions without discrete charge states have no analytic sensitivities.
+    analytic = all(hasattr(ion, 'valence') for ion in ions)
+
+    def zone(log_concentrations):
+        solution = previous._derive(ions, np.exp(log_concentrations))
+        solution._guess = state['guess']
+        state['guess'] = (solution.pH, solution.ionic_strength)
+        return solution
+
+    # The residuals are scaled to be dimensionless. The concentrations are
+    # solved for in log space, so that they stay positive.
+    def min_func(log_concentrations):
+        solution = zone(log_concentrations)
+        concentrations = solution.concentrations
+        properties = solution.properties()
+        mobility = properties['mobility']
+        conductivity = properties['conductivity']
+        speed = lpm3 * mobility / conductivity
+
+        n = len(flux)
+        residual = np.zeros(len(ions))
+        residual[:n] = (concentrations[:n] * (speed[:n] - velocity) -
+                        flux) / scale
+        if advancing is not None:
+            residual[-1] = speed[-1] / velocity - 1
+        if not analytic:
+            return residual
+
+        sensitivities = solution.sensitivities()
+        d_speed = lpm3 * (sensitivities['mobility']['concentration'] /
+                          conductivity -
+                          np.outer(mobility, sensitivities['conductivity']
+                                   ['concentration']) / conductivity**2)
+        jacobian = np.zeros((len(ions), len(ions)))
+        jacobian[:n] = ((np.diag(speed - velocity)[:n] +
+                         concentrations[:n, np.newaxis] * d_speed[:n]) /
+                        scale[:, np.newaxis])
+        if advancing is not None:
+            jacobian[-1] = d_speed[-1] / velocity
+        return residual, jacobian * concentrations
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            result = root(min_func, np.log(guess), jac=analytic,
+                          method='hybr')
+    except Exception as e:
+        msg = 'Solver failed on iteration. \nSolution: {}\nError: {}'
+        raise RuntimeError(msg.format(repr(previous), e))
+
+    if result.success:
+        return zone(result.x)
+    else:
+        msg = 'Solver failed to converge. \nSolution: {}\nError: {}'
+        raise RuntimeError(msg.format(repr(previous), result.message))
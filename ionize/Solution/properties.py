@@ -0,0 +1,113 @@
+from __future__ import division
+import numpy as np
+
+from ..constants import lpm3, faraday
+from ..Ion.mobility import _solution_interaction, _corrected_mobility
+from .equilibrium import _acidity_table, _state_fractions
+
+
+def properties(self):
+    """Return a snapshot of the transport properties of the solution's ions.
+
+    Every ion's properties are computed in one pass, and the snapshot is
+    cached against the current pH, ionic strength, and temperature. The
+    snapshot is a dict with the following entries. Entries that hold a value
+    for each ion are in the order of the ions in the solution.
+
+    ionization_fraction: The fraction of each ion in each charge state. None
+    for ions without discrete charge states.
+
+    actual_mobility: The mobility of each charge state of each ion. None for
+    ions without discrete charge states.
+
+    mobility: The effective mobility of each ion.
+
+    charge: The average charge of each ion.
+
+    molar_conductivity: The molar conductivity of each ion.
+
+    hydronium_conductivity, hydroxide_conductivity: The conductivity of the
+    water ions.
+
+    conductivity: The conductivity of the solution.
+
+    transference: The fraction of the current carried by each ion.
+
+    The arrays of the snapshot are read-only, and each call returns a new
+    dict, so that callers cannot change the cached snapshot.
+    """
+    state = (self.pH, self.ionic_strength, self.temperature())
+    if self._properties_cache is None or self._properties_cache[0] != state:
+        snapshot = _snapshot(self)
+        for value in snapshot.values():
+            for array in (value if isinstance(value, tuple) else (value,)):
+                if isinstance(array, np.ndarray):
+                    array.flags.writeable = False
+        self._properties_cache = (state, snapshot)
+    return dict(self._properties_cache[1])
+
+
+def _snapshot(self):
+    """Compute the properties snapshot of a solution."""
+    n = len(self.ions)
+    fractions, actual = [None] * n, [None] * n
+    mobility, charge, conductivity = np.zeros(n), np.zeros(n), np.zeros(n)
+
+    # Ions with discrete charge states are evaluated together.
+    small = [index for index, ion in enumerate(self.ions)
+             if hasattr(ion, 'valence')]
+    if small:
+        ions = [self.ions[index] for index in small]
+        temperature = self.temperature()
+        ionic_strength = self.ionic_strength
+
+        valence, log_L, activity_L = _acidity_table(ions, temperature)
+        log_gamma = np.log10(self._solvent.activity(1., ionic_strength,
+                                                    temperature))
+        log_L = np.log(10.) * (log_L + activity_L * log_gamma)
+        log_cH = np.log(self._cH())
+        table = _state_fractions(valence, log_L, log_cH)
+
+        # The charged states of every ion are corrected together.
+        factors = self._interaction_factors()
+        missing = [ion for ion in ions if ion not in factors]
+        if missing:
+            factors = _solution_interaction(self, missing)
+        states = valence != 0
+        owner = np.nonzero(states)[0]
+        state_valence = valence[states]
+        f = table[states]
+        m = _corrected_mobility(
+            np.concatenate([ion.absolute_mobility() for ion in ions]),
+            state_valence, None, ionic_strength, self._solvent, temperature,
+            np.concatenate([factors[ion] for ion in ions]))
+
+        bounds = np.cumsum([0] + [len(ion.valence) for ion in ions])
+        for row, index in enumerate(small):
+            start, end = bounds[row], bounds[row + 1]
+            fractions[index], actual[index] = f[start:end], m[start:end]
+        mobility[small] = np.bincount(owner, f * m, len(ions))
+        charge[small] = np.bincount(owner, f * state_valence, len(ions))
+        conductivity[small] = lpm3 * faraday * np.bincount(
+            owner, f * state_valence * m, len(ions))
+
+    for index, ion in enumerate(self.ions):
+        if fractions[index] is None:
+            mobility[index] = ion.mobility()
+            charge[index] = ion.charge()
+            conductivity[index] = ion.molar_conductivity()
+
+    hydronium = self.hydronium_conductivity()
+    hydroxide = self.hydroxide_conductivity()
+    total = (np.sum(self.concentrations * conductivity) +
+             hydronium + hydroxide)
+
+    return {'ionization_fraction': tuple(fractions),
+            'actual_mobility': tuple(actual),
+            'mobility': mobility,
+            'charge': charge,
+            'molar_conductivity': conductivity,
+            'hydronium_conductivity': hydronium,
+            'hydroxide_conductivity': hydroxide,
+            'conductivity': total,
+            'transference': self.concentrations * conductivity / total}
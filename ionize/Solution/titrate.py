@@ -3,39 +3,17 @@ from scipy.optimize import brentq, root
 import numpy as np
 import numbers
 import warnings
-from copy import deepcopy
 
 from ..Ion.BaseIon import BaseIon
-from ..Ion import Ion
 from ..Database import Database
 from ..constants import atmospheric_CO2
+from .equilibrium import _acidity_table, _batch_equilibrium
+from .isotachophoresis import _adjusted_zone
 
 
 database = Database()
 
 
-def buffering_capacity(self):
-    """Return the buffering capacity of the solution.
-
-    This function generates an approximate solution to the buffering
-    capacity by finding the derivative of the pH with respect to
-    the addition of an acid insult at small concentration.
-    """
-    # Remove any ions at concentration 0.
-    c = 0.001*min([cp for cp in self.concentrations if cp > 0])
-    Cb = 0
-
-    # Add an acid insult at 0.1% the lowest concentration in the solution.
-    # If the buffering capacity is measured as above the insult c,
-    # make the insult c lower.
-    while Cb < c:
-        new_sol = self + (Ion('Acid Insult', [-1], [-2], [-1]), c)
-        # Find the slope of the pH.
-        Cb = abs(c/(self.pH-new_sol.pH))
-        c = 0.01 * Cb
-    return Cb
-
-
 def titrate(self, titrant, target, titration_property='pH'):
     """Return a Solution titrated to the target pH using the titrant.
 
@@ -88,13 +66,264 @@ def titrate(self, titrant, target, titration_property='pH'):
         raise TypeError('Titrant must be an Ion, an ion name string, or a Solution.')
 
 
+def titrate_multi(self, targets, guess=None, tolerance=1e-10):
+    """Return a Solution titrated to several targets at once.
+
+    Each titrant is adjusted so that, together, the titrants achieve every
+    target. The amounts are found with a multidimensional root finder. Each
+    equilibrium is warm started from the last, and the Jacobian of the pH,
+    ionic strength, and conductivity is found analytically from
+    sensitivities(). Other properties use a finite difference Jacobian.
+
+    Returns the titrated Solution and a dict of diagnostics: 'amounts', the
+    amount of each titrant, in the order of the targets; 'residual', the
+    error in each target; 'success'; 'message'; and 'evaluations', the number
+    of equilibria computed. Raises RuntimeError if the solver does not
+    converge.
+
+    :param targets: A dict from each titrant to a (property, target) pair,
+    or to a target pH. Titrants may be Ions, ion name strings, or Solutions.
+    Ions are added in molar. Solutions are mixed with the solution as a volume
+    fraction. The volume fractions of the Solutions stay between 0 and 1, and
+    their sum stays below 1.
+    :param guess: An optional initial amount of each titrant. The volume
+    fractions must sum to less than 1.
+    :param tolerance: The relative tolerance in the amounts.
+    """
+    from . import Solution
+    titrants, properties, values = [], [], []
+    for titrant, target in targets.items():
+        if isinstance(titrant, str):
+            titrant = database.load(titrant)
+        if not isinstance(titrant, (BaseIon, Solution)):
+            raise TypeError('Titrant must be an Ion, an ion name string, '
+                            'or a Solution.')
+        if isinstance(target, numbers.Number):
+            target = ('pH', target)
+        titrants.append(titrant)
+        properties.append(target[0])
+        values.append(target[1])
+
+    # The concentrations are linear in the amounts of titrant.
+    ions = list(self.ions)
+    for titrant in titrants:
+        for ion in (titrant.ions if isinstance(titrant, Solution)
+                    else [titrant]):
+            if ion not in ions:
+                ions.append(ion)
+    base = np.array([self.concentration(ion) for ion in ions])
+    directions = np.array([[titrant.concentration(ion) - concentration
+                            if isinstance(titrant, Solution)
+                            else float(ion == titrant)
+                            for ion, concentration in zip(ions, base)]
+                           for titrant in titrants])
+
+    mixed = np.array([isinstance(titrant, Solution) for titrant in titrants])
+    if guess is None:
+        scale = max(np.sum(base), 1e-3)
+        guess = np.where(mixed, 0.1 / max(np.sum(mixed), 1), scale)
+    guess = np.array(guess, dtype=float)
+    if np.any(guess <= 0) or np.sum(guess[mixed]) >= 1:
+        raise ValueError('Each guess must be positive, and the volume '
+                         'fractions of the Solutions must sum to less than '
+                         '1.')
+
+    analytic = all(property_ in ('pH', 'ionic_strength', 'conductivity')
+                   for property_ in properties)
+    state = {'guess': self._warm_start(), 'evaluations': 0}
+
+    def titrated(amounts):
+        solution = self._derive(ions, base + amounts.dot(directions))
+        solution._guess = state['guess']
+        state['guess'] = (solution.pH, solution.ionic_strength)
+        state['evaluations'] += 1
+        return solution
+
+    def evaluate(solution, property_):
+        value = getattr(solution, property_)
+        return value if isinstance(value, numbers.Number) else value()
+
+    # The amounts are solved for in log space, so that they stay positive.
+    # The volume fractions are the softmax of their variables against the
+    # remaining volume, so that their sum stays below 1.
+    def transform(variables):
+        """Return the amounts, and their derivatives with the variables."""
+        amounts = np.exp(variables)
+        shift = np.max(variables[mixed], initial=0.)
+        weights = np.exp(variables[mixed] - shift)
+        amounts[mixed] = weights / (np.exp(-shift) + np.sum(weights))
+        derivative = np.diag(amounts)
+        derivative[np.ix_(mixed, mixed)] -= np.outer(amounts[mixed],
+                                                     amounts[mixed])
+        return amounts, derivative
+
+    def min_func(variables):
+        amounts, derivative = transform(variables)
+        solution = titrated(amounts)
+        residual = np.array([evaluate(solution, property_)
+                             for property_ in properties]) - values
+        if not analytic:
+            return residual
+
+        sensitivities = solution.sensitivities()
+        columns = [ions.index(ion) for ion in solution.ions]
+        jacobian = np.array([directions[:, columns].dot(
+            sensitivities[property_]['concentration'])
+            for property_ in properties]).dot(derivative)
+        return residual, jacobian
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            variables = np.log(guess)
+            variables[mixed] -= np.log(1. - np.sum(guess[mixed]))
+            result = root(min_func, variables, jac=analytic,
+                          method='hybr', options={'xtol': tolerance})
+    except (RuntimeError, ValueError) as e:
+        raise RuntimeError('Solver failed on iteration. {}'.format(e))
+
+    amounts = transform(result.x)[0]
+    solution = titrated(amounts)
+    diagnostics = {'amounts': amounts,
+                   'residual': np.array([evaluate(solution, property_)
+                                         for property_ in properties]) -
+                   values,
+                   'success': result.success,
+                   'message': result.message,
+                   'evaluations': state['evaluations']}
+
+    if not result.success:
+        raise RuntimeError('Solver did not converge. {}'.format(
+            result.message))
+    return solution, diagnostics
+
+
+def titration_curve(self, titrant, amounts, targets=None,
+                    titration_property='pH'):
+    """Return the titration curve of the solution.
+
+    The titrant is added in each of the amounts in turn. Each equilibrium is
+    warm started from a linear prediction from the previous two, so a curve
+    costs little more than one titration.
+
+    Returns a dict of arrays with an entry for each amount: 'amounts', 'pH',
+    'ionic_strength', 'conductivity', and the titration property. If targets
+    are given, the dict also holds 'targets' and 'target_amounts', the amount
+    of titrant that achieves each target. Each is found in the first interval
+    of the curve that brackets the target. Targets that the curve does not
+    reach have an amount of NaN.
+
+    :param titrant: An Ion, an ion name string, or a Solution. Ions are added
+    at each amount, in molar. Solutions are mixed with the solution at each
+    amount, as a volume fraction from 0 to 1.
+    :param amounts: An iterable of amounts of titrant.
+    :param targets: An optional iterable of target values of the titration
+    property.
+    :param titration_property: The property of the Solution to interpolate on.
+    """
+    from . import Solution
+    if isinstance(titrant, str):
+        titrant = database.load(titrant)
+
+    if isinstance(titrant, BaseIon):
+        def titrated(amount):
+            return self + (titrant, amount)
+    elif isinstance(titrant, Solution):
+        def titrated(amount):
+            return self * (1 - amount) + titrant * amount
+    else:
+        raise TypeError('Titrant must be an Ion, an ion name string, '
+                        'or a Solution.')
+
+    amounts = np.array(amounts, dtype=float, ndmin=1)
+    curve = {'amounts': amounts}
+    for key in ('pH', 'ionic_strength', 'conductivity', titration_property):
+        curve[key] = np.zeros(len(amounts))
+
+    def evaluate(solution):
+        value = getattr(solution, titration_property)
+        return value if isinstance(value, numbers.Number) else value()
+
+    states = []
+    for index, amount in enumerate(amounts):
+        solution = titrated(amount)
+
+        # Predict the equilibrium from the last two points.
+        if len(states) > 1:
+            (a0, state0), (a1, state1) = states[-2:]
+            step = (amount - a1) / (a1 - a0) if a1 != a0 else 0.
+            solution._guess = tuple(y1 + step * (y1 - y0)
+                                    for y0, y1 in zip(state0, state1))
+        elif states:
+            solution._guess = states[-1][1]
+
+        curve['pH'][index] = solution.pH
+        curve['ionic_strength'][index] = solution.ionic_strength
+        curve['conductivity'][index] = solution.conductivity()
+        curve[titration_property][index] = evaluate(solution)
+        states.append((amount, (solution.pH, solution.ionic_strength)))
+
+    if targets is not None:
+        curve['targets'] = np.array(targets, dtype=float, ndmin=1)
+        curve['target_amounts'] = np.full(len(curve['targets']), np.nan)
+        values = curve[titration_property]
+
+        for index, target in enumerate(curve['targets']):
+            # Find the first interval that brackets the target.
+            offset = values - target
+            crossings = np.flatnonzero(offset[:-1] * offset[1:] <= 0)
+            if not crossings.size:
+                continue
+            i = crossings[0]
+            if offset[i] == 0 or offset[i + 1] == 0:
+                curve['target_amounts'][index] = amounts[i if offset[i] == 0
+                                                         else i + 1]
+                continue
+
+            # Refine the interpolated amount, starting from the interval.
+            def min_func(amount):
+                solution = titrated(amount)
+                solution._guess = states[i][1]
+                return evaluate(solution) - target
+
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                curve['target_amounts'][index] = \
+                    brentq(min_func, amounts[i], amounts[i + 1])
+
+    return curve
+
+
 def equilibrate_CO2(self, partial_pressure=atmospheric_CO2):
     """Titrate the CO2 in solution to equilibrium with the atmosphere.
 
+    Dissolved CO2 is held at its Henry's law concentration as the neutral
+    state of carbonic acid, so the equilibrium is found in one solve. Any
+    carbonic acid already in the solution is replaced.
+
     :param partial_pressure: The partial pressure of CO2 in the atmosphere,
     in bar. Defaults to the typical value of Earth's atmosphere.
     """
     CO2 = database['carbonic acid']
+    if not all(hasattr(ion, 'valence') for ion in self.ions):
+        return _bracketed_CO2(self, CO2, partial_pressure)
+
+    ions = [ion for ion in self.ions if ion != CO2]
+    pH, ionic_strength, total, _ = _CO2_equilibrium(self, ions,
+                                                    partial_pressure,
+                                                    self.temperature())
+    new_solution = self._derive(ions + [CO2],
+                                [self.concentration(ion) for ion in ions] +
+                                [float(total)])
+    new_solution._guess = (float(pH), float(ionic_strength))
+    return new_solution
+
+
+def _bracketed_CO2(self, CO2, partial_pressure):
+    """Return the solution in equilibrium with CO2, found from a bracket.
+
+    Used for solutions with ions that have no discrete charge states.
+    """
     eq = partial_pressure * self._solvent.henry_CO2(self.temperature())
 
     def min_func(concentration):
@@ -113,8 +342,100 @@ def equilibrate_CO2(self, partial_pressure=atmospheric_CO2):
         raise RuntimeError('Solver did not converge')
 
 
+def _CO2_equilibrium(self, ions, partial_pressure, temperature):
+    """Return the equilibrium of the ions with dissolved CO2.
+
+    Returns the pH, the ionic strength, and the total concentration of
+    carbonic acid, broadcast over the partial pressures and temperatures, and
+    a SolutionArray of the equilibrated conditions, flattened, which holds the
+    equilibrium without solving it again.
+
+    :param ions: The ions in the solution, other than carbonic acid.
+    :param partial_pressure: The partial pressure of CO2, in bar.
+    :param temperature: The temperature, in Celsius.
+    """
+    from .SolutionArray import SolutionArray
+    CO2 = database['carbonic acid']
+    partial_pressure, temperature = np.broadcast_arrays(
+        np.asarray(partial_pressure, dtype=float),
+        np.asarray(temperature, dtype=float))
+    shape = partial_pressure.shape
+    partial_pressure = partial_pressure.ravel()
+    temperature = temperature.ravel()
+
+    pH, ionic_strength, total, dissociation = (
+        np.zeros(partial_pressure.size) for _ in range(4))
+    fractions = dict()
+    fixed = np.array([False] * len(ions) + [True])
+    for T in np.unique(temperature):
+        rows = np.flatnonzero(temperature == T)
+        concentrations = np.zeros((rows.size, len(ions) + 1))
+        concentrations[:, :-1] = [self.concentration(ion) for ion in ions]
+        concentrations[:, -1] = (partial_pressure[rows] *
+                                 self._solvent.henry_CO2(T))
+
+        valence, log_L0, activity_L = _acidity_table(ions + [CO2], T)
+        pH[rows], ionic_strength[rows], dissociation[rows], \
+            fractions[T], totals = \
+            _batch_equilibrium(self._solvent, valence, log_L0, activity_L,
+                               concentrations, T, fixed=fixed)
+        fractions[T] = (valence, fractions[T])
+        total[rows] = totals[:, -1]
+
+    concentrations = np.zeros((total.size, len(ions) + 1))
+    concentrations[:, :-1] = [self.concentration(ion) for ion in ions]
+    concentrations[:, -1] = total
+    solutions = SolutionArray._from_equilibrium(
+        ions + [CO2], concentrations, temperature, pH, ionic_strength,
+        dissociation, fractions)
+    return (pH.reshape(shape), ionic_strength.reshape(shape),
+            total.reshape(shape), solutions)
+
+
+def co2_sweep(self, partial_pressures, temperatures=None):
+    """Return the properties of the solution over CO2 partial pressures.
+
+    The solution is equilibrated with each partial pressure of CO2 at each
+    temperature, as in equilibrate_CO2, with every condition solved at once.
+    The partial pressures and temperatures are broadcast together.
+
+    Returns a dict of arrays: 'partial_pressure', 'temperature', 'pH',
+    'ionic_strength', 'conductivity', and 'CO2', the total concentration of
+    carbonic acid.
+
+    :param partial_pressures: The partial pressures of CO2, in bar.
+    :param temperatures: The temperatures, in Celsius. Defaults to the
+    temperature of the solution.
+    """
+    CO2 = database['carbonic acid']
+    if temperatures is None:
+        temperatures = self.temperature()
+    partial_pressures, temperatures = np.broadcast_arrays(
+        np.asarray(partial_pressures, dtype=float),
+        np.asarray(temperatures, dtype=float))
+
+    ions = [ion for ion in self.ions if ion != CO2]
+    # The conductivity is found from the equilibrium of the sweep, without
+    # solving it again.
+    pH, ionic_strength, total, solutions = _CO2_equilibrium(
+        self, ions, partial_pressures, temperatures)
+
+    return {'partial_pressure': partial_pressures,
+            'temperature': temperatures,
+            'pH': pH,
+            'ionic_strength': ionic_strength,
+            'conductivity': solutions.conductivity().reshape(total.shape),
+            'CO2': total}
+
+
 def displace(self, receding, advancing=None, guess=None):
-    """Electrophoretically displace an ion."""
+    """Electrophoretically displace an ion.
+
+    Returns the zone formed when the advancing ion displaces the receding ion,
+    or when the receding ion is removed, if there is no advancing ion. The
+    guess is an optional concentration of each ion in the new zone: the ions
+    of the solution without the receding ion, followed by the advancing ion.
+    """
     # Convert ion names to ions
     if isinstance(advancing, str):
         advancing = database[advancing]
@@ -129,54 +450,8 @@ def displace(self, receding, advancing=None, guess=None):
     assert receding in self, \
         'The receding ion is not present.'
 
-    # Make a new solution to perform optimization.
-    new_solution = deepcopy(self)
-    if advancing is not None:
-        new_solution._contents[advancing] = \
-            new_solution._contents.pop(receding)
-        advancing.context(new_solution)
-    else:
-        new_solution._contents.pop(receding)
-
-    # If there is a guess, use it to update the concentrations
+    velocity = 1./self.zone_transfer(receding)
     if guess is not None:
-        assert len(new_solution.ions) == len(guess), 'Incorrect guess length.'
-        for ion, c_guess in zip(new_solution._contents.keys(), guess):
-            new_solution._contents[ion] = c_guess
-
-    new_solution._equilibrate()
-
-    def min_func(concentrations):
-        for ion, concentration in zip(new_solution.ions,
-                                      concentrations):
-            new_solution._contents[ion] = abs(concentration)
-
-        new_solution._equilibrate()
-
-        velocity = 1./self.zone_transfer(receding)
-
-        err = []
-
-        for ion in new_solution.ions:
-            if ion is advancing:
-                err.append(1./new_solution.zone_transfer(ion) - velocity)
-            else:
-                err.append(new_solution.concentration(ion) -
-                           self.concentration(ion) *
-                           (1./self.zone_transfer(ion)-velocity) /
-                           (1./new_solution.zone_transfer(ion)-velocity)
-                           )
-
-        return np.array(err)
-
-    try:
-        sol = root(min_func, new_solution.concentrations, method='lm')
-    except Exception as e:
-        msg = 'Solver failed on iteration. \nSolution: {}\nError: {}'
-        raise RuntimeError(msg.format(repr(new_solution), e))
-
-    if sol['success']:
-        return new_solution
-    else:
-        msg = 'Solver failed to converge. \nSolution: {}\nError: {}'
-        raise RuntimeError(msg.format(repr(new_solution), sol['message']))
+        assert len(guess) == len(self.ions) - (advancing is None), \
+            'Incorrect guess length.'
+    return _adjusted_zone(self, receding, advancing, velocity, guess)
@@ -5,17 +5,23 @@ database = Database()
 
 
 def transference(self, ion):
-    """Return the fraction of charge carried by each of the ions as a list.
+    """Return the fraction of charge carried by the ion.
 
-    Should not precisely add to 1, because some charge is carried by
-    dissociated water.
+    The fractions of every ion, from properties()['transference'], should not
+    precisely add to 1, because some charge is carried by dissociated water.
+    The fraction carried by hydronium or hydroxide is also available.
     """
     if ion in self:
         if isinstance(ion, str):
             ion = self._name_lookup[ion]
-        with ion.context(self):
-            return (self.concentration(ion) * ion.molar_conductivity() /
-                    self.conductivity())
+        properties = self.properties()
+        if ion == self._hydronium:
+            return (properties['hydronium_conductivity'] /
+                    properties['conductivity'])
+        elif ion == self._hydroxide:
+            return (properties['hydroxide_conductivity'] /
+                    properties['conductivity'])
+        return properties['transference'][self.ions.index(ion)]
     else:
         return 0
 
@@ -1,17 +1,29 @@
 """Create the Aqueous class to hold the properties of water."""
 from __future__ import division
-from math import log10, log, pi, sqrt, exp
+from math import log10, log, pi, sqrt
+import numpy as np
 from .constants import gas_constant, reference_temperature, \
                        kelvin, elementary_charge, avogadro,\
                        boltzmann, permittivity, lpm3, pitts
+from .cache import ParameterCache, solvent_cached
 
 
 class Solvent(object):
 
+    """The base class for solvents.
+
+    Solvent properties are classmethods. Each accepts scalars or arrays. The
+    values of the most used properties at scalar conditions are kept in a
+    cache shared by all solvents, so that repeated evaluation at the same
+    ionic strength and temperature is a lookup.
+    """
+
     reference_dissociation = None
     enthalpy = None
     heat_capacity = None
 
+    _parameter_cache = ParameterCache(maxsize=256)
+
     def __new__(cls, *args, **kwargs):
         raise TypeError('Solvents may not be instantiated.')
 
@@ -29,9 +41,15 @@ class Solvent(object):
         raise NotImplementedError
 
     @classmethod
+    def cache_info(self):
+        """Return statistics of the solvent property cache."""
+        return self._parameter_cache.info()
+
+    @classmethod
+    @solvent_cached
     def dissociation(self, ionic_strength, temperature):
         """Return the dissociation constant of water."""
-        if temperature == reference_temperature:
+        if np.ndim(temperature) == 0 and temperature == reference_temperature:
             dissociation_ = self.reference_dissociation
         else:
             reference_temperature_k = kelvin(reference_temperature)
@@ -45,7 +63,7 @@ class Solvent(object):
             cp_contribution = (self.heat_capacity / log(10.) /
                                gas_constant) * \
                 (reference_temperature_k / temperature_k - 1. +
-                 log10(temperature_k / reference_temperature_k))
+                 np.log10(temperature_k / reference_temperature_k))
 
             pKs = (self.reference_pKs() -
                    enthalpy_contribution -
@@ -54,8 +72,8 @@ class Solvent(object):
             dissociation_ = 10.0**(-pKs)
 
         # correct for ionic strength
-        dissociation_ /= self.activity(1., ionic_strength=ionic_strength,
-                                       temperature=temperature)**2.
+        dissociation_ = dissociation_ / self.activity(1., ionic_strength,
+                                                      temperature)**2.
         return dissociation_
 
     @classmethod
@@ -68,6 +86,7 @@ class Solvent(object):
         return lamda
 
     @classmethod
+    @solvent_cached
     def debye_huckel(self, temperature):
         """Return the Debye-Huckel constant, in M^-(1/2)."""
         dh = elementary_charge**3. * sqrt(avogadro) / 2.**(5./2.) / pi / \
@@ -91,33 +110,36 @@ class Solvent(object):
         try:
             cH = 10**-pH
         except TypeError:
-            cH = sqrt(self.dissociation(ionic_strength=0.,
-                                        temperature=temperature))
+            cH = np.sqrt(self.dissociation(0., temperature))
 
         if temperature is None:
             temperature = self.reference_temperature
 
-        cOH = self.dissociation(ionic_strength=0., temperature=temperature)/cH
+        cOH = self.dissociation(0., temperature)/cH
         return (cH + cOH)/2.
 
     @classmethod
     def pKs(self, ionic_strength, temperature):
         """Return the pKs for the solvent."""
-        return -log10(self.dissociation(ionic_strength, temperature))
+        return -np.log10(self.dissociation(ionic_strength, temperature))
 
     @classmethod
     def activity(self, valence, ionic_strength, temperature):
         """Return activity coefficients of a charge state."""
+        return 10**((valence**2) * self._log_activity(ionic_strength,
+                                                       temperature))
 
+    @classmethod
+    @solvent_cached
+    def _log_activity(self, ionic_strength, temperature):
+        """Return the log10 activity coefficient of a univalent ion."""
         # Specified in Bahga.
-        A = (self.debye_huckel(temperature) * sqrt(ionic_strength) /
-             (1. + pitts * sqrt(ionic_strength))
+        A = (self.debye_huckel(temperature) * np.sqrt(ionic_strength) /
+             (1. + pitts * np.sqrt(ionic_strength))
              )
         B = 0.1 * ionic_strength
 
-        gamma = 10**((valence**2)*(B-A))
-
-        return gamma
+        return B - A
 
 
 class Aqueous(Solvent):
@@ -129,6 +151,7 @@ class Aqueous(Solvent):
     heat_capacity = -224.              # heat capacity of water
 
     @classmethod
+    @solvent_cached
     def dielectric(self, temperature):
         """Return the dielectric constant of water at a specified temperature.
 
@@ -140,6 +163,7 @@ class Aqueous(Solvent):
         return dielectric_
 
     @classmethod
+    @solvent_cached
     def viscosity(self, temperature):
         """Return the viscosity of water at the specified temperature.
 
@@ -154,5 +178,5 @@ class Aqueous(Solvent):
         """Returns the henry's law constant for CO2."""
         temperature = kelvin(temperature)
         reference = kelvin(reference_temperature)
-        H = 0.034 * exp(2400. * (1./temperature - 1./reference))
+        H = 0.034 * np.exp(2400. * (1./temperature - 1./reference))
         return H
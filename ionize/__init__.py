@@ -15,8 +15,11 @@ from .Solvent import Aqueous
 from .Ion import Ion
 from .PolyIon import NucleicAcid, Peptide
 from .IonComplex import IonComplex, Protein
-from .Solution import Solution
+from .Solution import Solution, SolutionArray
+from .Ampholyte import AmpholyteMixture
 from .deserialize import deserialize
 from .Database import Database
+from . import screening
+from .simulation import simulate
 
 # TODO: include pitzer model for high ionic strength NaCl activity
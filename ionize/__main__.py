@@ -26,7 +26,7 @@ def ion(name):
     if name in db:
         result = db[name]
         click.echo(result.serialize(nested = False, compact = True))
-    elif (search_results := db.search(name)):
+    elif (search_results := db.suggest(name) or db.search(name)):
         click.echo('Did you mean one of these?')
         for result in search_results:
             click.echo(f"\t{result}")
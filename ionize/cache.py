@@ -0,0 +1,113 @@
+"""Caches for the temperature dependent parameters of ions and solvents."""
+from collections import OrderedDict, namedtuple
+import functools
+import warnings
+import numpy as np
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# The registry of warnings replayed from caches, so that the warning filters
+# apply to replayed warnings as they do to the originals.
+_registry = dict()
+
+
+class ParameterCache(object):
+
+    """A bounded, least recently used cache of parameters.
+
+    Values are keyed by the name of the parameter and the conditions, such as
+    temperature, at which it is evaluated. Ions and solvents are immutable, so
+    cached values never go stale. Warnings raised while computing a value are
+    cached with it, and raised again on every lookup.
+
+    :param maxsize: The maximum number of values to keep.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+
+    def get(self, key, function, *args):
+        """Return the cached value for the key, or compute function(*args).
+
+        Raises TypeError if the key is not hashable.
+        """
+        try:
+            value, caught = self._values[key]
+        except KeyError:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                value = function(*args)
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+            self.misses += 1
+            if len(self._values) >= self.maxsize:
+                self._values.popitem(last=False)
+            self._values[key] = value, caught
+        else:
+            self.hits += 1
+            self._values.move_to_end(key)
+
+        for warning in caught:
+            warnings.warn_explicit(warning.message, warning.category,
+                                   warning.filename, warning.lineno,
+                                   registry=_registry)
+        return value
+
+    def info(self):
+        """Return the hits, misses, maximum size, and current size."""
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self._values))
+
+    def clear(self):
+        """Empty the cache and reset the statistics."""
+        self._values.clear()
+        self.hits = self.misses = 0
+
+
+def temperature_cached(function):
+    """Cache a method of an ion whose only argument is a temperature.
+
+    Values are cached in the ion's _parameter_cache, which copies of the ion
+    share. Values are cached for scalar temperatures. Arrays of temperatures
+    are computed directly. Cached arrays are read-only.
+    """
+    name = function.__name__
+
+    @functools.wraps(function)
+    def cached(self, temperature):
+        if self._parameter_cache is not None:
+            try:
+                return self._parameter_cache.get((name, temperature),
+                                                 function, self, temperature)
+            except TypeError:
+                pass
+        return function(self, temperature)
+    return cached
+
+
+def solvent_cached(function):
+    """Cache a classmethod of a solvent, keyed by its arguments.
+
+    Values are cached in the solvent's _parameter_cache when every argument
+    is a positional scalar. Otherwise, they are computed directly, with lists
+    converted to arrays.
+    """
+    name = function.__name__
+
+    @functools.wraps(function)
+    def cached(cls, *args, **kwargs):
+        if not kwargs:
+            try:
+                return cls._parameter_cache.get((cls, name) + args,
+                                                function, cls, *args)
+            except TypeError:
+                pass
+        args = [np.asarray(arg) if isinstance(arg, (list, tuple)) else arg
+                for arg in args]
+        kwargs = {key: np.asarray(arg) if isinstance(arg, (list, tuple))
+                  else arg for key, arg in kwargs.items()}
+        return function(cls, *args, **kwargs)
+    return cached
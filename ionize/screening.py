@@ -0,0 +1,168 @@
+"""Screen isotachophoresis chemistries across the ion database.
+
+A chemistry is a leading ion, a trailing ion, and a counterion. The leading
+electrolyte holds the leading ion and the counterion, and the trailing zone is
+the adjusted zone formed when the trailing ion displaces the leading ion.
+Chemistries are independent, so they are evaluated in a pool of processes.
+
+Example:
+    ``results = ionize.screening.screen(trailing=['hepes', 'mes'],
+                                        counterions=['tris', 'bis-tris'])
+    best = ionize.screening.rank(results)[0]``
+"""
+from __future__ import division
+from collections import namedtuple
+import itertools
+import multiprocessing
+import numpy as np
+
+from .Database import Database
+from .Solution import Solution
+
+ScreeningResult = namedtuple('ScreeningResult',
+                             ['leading', 'trailing', 'counterion', 'pH',
+                              'trailing_pH', 'velocity', 'separability',
+                              'buffering_capacity', 'error'])
+
+# The database of each worker process, opened once by _initialize.
+_database = None
+
+
+def candidates(sign, database=None):
+    """Return the names of the database ions with a state of the sign.
+
+    Aliases are resolved, so that each ion is named once, and water ions are
+    excluded.
+
+    :param sign: -1 for anions, or 1 for cations.
+    :param database: The Database to search. Defaults to the default table.
+    """
+    database = database or Database(Database.default_table)
+    names = sorted(set(database._resolve(key) for key in database.keys()))
+    water = {database._resolve(key) for key in ('hydronium', 'hydroxide')}
+    return [name for name in names if name not in water and
+            np.any(np.sign(database[name].valence) == sign)]
+
+
+def screen(leading=None, trailing=None, counterions=None,
+           concentration=0.01, counterion_concentration=0.02, sign=-1,
+           processes=None, chunksize=8, database=None):
+    """Yield a ScreeningResult for each chemistry, as each is evaluated.
+
+    Every combination of three different ions, as the leading ion, the
+    trailing ion, and the counterion, is evaluated. Results are yielded in the
+    order they complete, not the order of the combinations. Chemistries that
+    cannot be solved are yielded with the error message, and NaN for each
+    property.
+
+    Each worker opens the database once, when it starts. The default database
+    is the memory mapped table, so that workers share its pages rather than
+    parsing the source. The database that Solution uses for water ions is
+    opened before the workers start, so that they inherit it.
+
+    :param leading: An iterable of names of leading ions. Defaults to every
+    database ion with a state of the sign.
+    :param trailing: An iterable of names of trailing ions. Defaults to every
+    database ion with a state of the sign.
+    :param counterions: An iterable of names of counterions. Defaults to every
+    database ion with a state of the opposite sign.
+    :param concentration: The concentration of the leading ion, in M.
+    :param counterion_concentration: The concentration of the counterion in
+    the leading electrolyte, in M.
+    :param sign: The sign of the leading and trailing ions. -1 for anionic
+    isotachophoresis, or 1 for cationic isotachophoresis.
+    :param processes: The number of worker processes. Defaults to the number
+    of CPUs. If 1, the chemistries are evaluated in this process.
+    :param chunksize: The number of chemistries sent to a worker at once.
+    :param database: The Database to draw ions from. Defaults to the table.
+    """
+    database = database or Database(Database.default_table)
+    leading, trailing = (candidates(sign, database) if names is None
+                         else list(names) for names in (leading, trailing))
+    if counterions is None:
+        counterions = candidates(-sign, database)
+
+    combinations = ((leading_ion, trailing_ion, counterion,
+                     concentration, counterion_concentration)
+                    for leading_ion, trailing_ion, counterion
+                    in itertools.product(leading, trailing, counterions)
+                    if len({leading_ion, trailing_ion, counterion}) == 3)
+
+    if processes == 1:
+        _initialize(database.source)
+        for combination in combinations:
+            yield _evaluate(combination)
+        return
+
+    Database().keys()
+    pool = multiprocessing.Pool(processes, initializer=_initialize,
+                                initargs=(database.source,))
+    try:
+        for result in pool.imap_unordered(_evaluate, combinations,
+                                          chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def rank(results, by=('separability', 'velocity', 'buffering_capacity')):
+    """Return the viable results, best first.
+
+    A result is viable if it was solved, and if the trailing ion is slower in
+    its zone than the leading ion is in the leading electrolyte. Each viable
+    result is ranked on each property, by magnitude, and the results are
+    ordered by the sum of their ranks, with ties broken by separability.
+
+    :param results: An iterable of ScreeningResults, such as from screen.
+    :param by: The names of the properties to rank by.
+    """
+    viable = [result for result in results
+              if result.error is None and result.separability > 0]
+    if not viable:
+        return []
+
+    scores = np.zeros(len(viable))
+    for field in by:
+        values = np.abs([getattr(result, field) for result in viable])
+        scores += np.argsort(np.argsort(-values))
+    order = sorted(range(len(viable)),
+                   key=lambda i: (scores[i], -viable[i].separability))
+    return [viable[i] for i in order]
+
+
+def _initialize(source):
+    """Open the database of a worker process."""
+    global _database
+    _database = Database(source)
+    _database.keys()
+
+
+def _evaluate(combination):
+    """Return the ScreeningResult of a chemistry."""
+    leading, trailing, counterion, concentration, counterion_concentration = \
+        combination
+    names = (leading, trailing, counterion)
+    try:
+        leading_ion, trailing_ion, counter_ion = (_database[name]
+                                                  for name in names)
+        leading_zone = Solution([leading_ion, counter_ion],
+                                [concentration, counterion_concentration])
+        trailing_zone = leading_zone.displace(leading_ion, trailing_ion)
+
+        leading_mobility = leading_zone.properties()['mobility'][
+            leading_zone.ions.index(leading_ion)]
+        trailing_mobility = trailing_zone.properties()['mobility'][
+            trailing_zone.ions.index(trailing_ion)]
+        return ScreeningResult(
+            leading, trailing, counterion,
+            leading_zone.pH, trailing_zone.pH,
+            float(1. / leading_zone.zone_transfer(leading_ion)),
+            float(1. - trailing_mobility / leading_mobility),
+            min(leading_zone.buffering_capacity(),
+                trailing_zone.buffering_capacity()),
+            None)
+    except (RuntimeError, ValueError, ZeroDivisionError,
+            np.linalg.LinAlgError) as e:
+        return ScreeningResult(leading, trailing, counterion,
+                               *([np.nan] * 5 + [str(e) or repr(e)]))
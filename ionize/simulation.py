@@ -0,0 +1,135 @@
+"""Simulate one-dimensional electrophoresis with ionize chemistry.
+
+The channel is divided into cells of equal length, and the concentration of
+each ion in each cell is advanced by electromigration and diffusion under a
+constant current density. The local pH, ionic strength, conductivity, and
+effective mobilities are found at every step from the batch equilibrium of all
+of the cells at once, with SolutionArray.
+
+Example:
+    ``snapshots = []
+    ionize.simulate(['tris', 'hydrochloric acid', 'hepes'], concentrations,
+                    length=0.01, current_density=-100., duration=10.,
+                    snapshots=11, output=snapshots.append)``
+"""
+from __future__ import division
+from collections import namedtuple
+import warnings
+import numpy as np
+
+from .Solution import SolutionArray
+
+Snapshot = namedtuple('Snapshot', ['time', 'position', 'concentrations', 'pH',
+                                   'ionic_strength', 'conductivity',
+                                   'mobility', 'field'])
+
+
+def simulate(ions, concentrations, length, current_density, duration,
+             snapshots=2, output=None, temperature=None, courant=0.5,
+             max_steps=1000000):
+    """Simulate electrophoresis in a channel, and return the final Snapshot.
+
+    Each ion moves at its local effective mobility times the local electric
+    field, which is the current density divided by the local conductivity, and
+    diffuses with its local diffusivity. Fluxes between cells are upwinded,
+    with limited linear reconstruction, and the concentrations are advanced
+    with a two stage strong stability preserving Runge-Kutta method.
+
+    The time step adapts to the state of the channel. Each step is the
+    fraction of the largest stable step given by the Courant number, using
+    the fastest ion velocity and the largest diffusivity in the channel. Each
+    end of the channel is held at its initial composition, like a reservoir.
+    Ions that are fully neutral in a cell have no defined diffusivity there,
+    and do not diffuse.
+
+    :param ions: An iterable of ions or names, with discrete charge states.
+    :param concentrations: The initial concentration of each ion in each
+    cell, in M, with one row per cell and one column per ion.
+    :param length: The length of the channel, in m.
+    :param current_density: The current density, in A/m^2. Positive current
+    moves cations toward the end of the channel.
+    :param duration: The duration of the simulation, in s.
+    :param snapshots: The number of evenly spaced snapshots, including the
+    initial and final state, or an increasing sequence of snapshot times.
+    :param output: An optional callable, which is called with each Snapshot
+    in turn, such as the append method of a list, or a function that writes
+    to a file.
+    :param temperature: The temperature of the channel, in Celsius.
+    :param courant: The fraction of the largest stable time step to take.
+    :param max_steps: The maximum number of time steps.
+    """
+    concentrations = np.array(concentrations, dtype=float, ndmin=2)
+    cells = len(concentrations)
+    dx = length / cells
+    position = (np.arange(cells) + .5) * dx
+    if np.ndim(snapshots) == 0:
+        snapshots = np.linspace(0., duration, int(snapshots))
+    snapshots = np.asarray(snapshots, dtype=float)
+
+    # The reservoirs are ghost cells at each end of the channel.
+    padded = np.concatenate([concentrations[:1], concentrations,
+                             concentrations[-1:]])
+    reservoirs = padded[[0, -1]]
+    state = SolutionArray(ions, padded, temperature)
+
+    def rate(concentrations):
+        """Return the rate of change, stable step, equilibrium and field."""
+        padded = np.concatenate([reservoirs[:1], concentrations,
+                                 reservoirs[1:]])
+        equilibrium = state._derive(padded)
+        field = current_density / equilibrium.conductivity()
+        speed = equilibrium.mobility() * field[:, np.newaxis]
+        diffusivity = np.nan_to_num(equilibrium.diffusivity())
+
+        # The slopes are limited with minmod, and are zero in the reservoirs.
+        difference = np.diff(padded, axis=0)
+        slope = np.zeros_like(padded)
+        slope[1:-1] = np.where(difference[:-1] * difference[1:] > 0,
+                               np.sign(difference[1:]) *
+                               np.minimum(abs(difference[:-1]),
+                                          abs(difference[1:])), 0.)
+
+        face_speed = (speed[:-1] + speed[1:]) / 2.
+        face_diffusivity = (diffusivity[:-1] + diffusivity[1:]) / 2.
+        flux = (np.maximum(face_speed, 0.) * (padded[:-1] + slope[:-1] / 2.) +
+                np.minimum(face_speed, 0.) * (padded[1:] - slope[1:] / 2.) -
+                face_diffusivity * difference / dx)
+
+        tiny = np.finfo(float).tiny
+        limit = min(dx / max(np.max(abs(speed)), tiny),
+                    dx**2 / 2. / max(np.max(diffusivity), tiny))
+        return -np.diff(flux, axis=0) / dx, limit, equilibrium, field
+
+    def snapshot(time, equilibrium, field):
+        """Return a Snapshot of the cells, without the reservoirs."""
+        return Snapshot(time, position, equilibrium.concentrations[1:-1],
+                        equilibrium.pH[1:-1],
+                        equilibrium.ionic_strength[1:-1],
+                        equilibrium.conductivity()[1:-1],
+                        equilibrium.mobility()[1:-1], field[1:-1])
+
+    time, steps, index = 0., 0, 0
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        change, limit, state, field = rate(concentrations)
+        while True:
+            while index < len(snapshots) and snapshots[index] <= time:
+                last = snapshot(time, state, field)
+                if output is not None:
+                    output(last)
+                index += 1
+            if index == len(snapshots):
+                return last
+
+            if steps == max_steps:
+                raise RuntimeError('The simulation did not finish in {} '
+                                   'steps.'.format(max_steps))
+            step = min(courant * limit, snapshots[index] - time)
+            stage = np.maximum(concentrations + step * change, 0.)
+            stage_change = rate(stage)[0]
+            concentrations = np.maximum(
+                (concentrations + stage + step * stage_change) / 2., 0.)
+            time = (snapshots[index] if step == snapshots[index] - time
+                    else time + step)
+            steps += 1
+            change, limit, state, field = rate(concentrations)
@@ -4,9 +4,12 @@ from .Solvent import Aqueous
 from .Ion import Ion
 from .PolyIon import NucleicAcid, Peptide
 from .IonComplex import Protein
-from .Solution import Solution
+from .Solution import Solution, SolutionArray
+from .Ampholyte import AmpholyteMixture
 from .Database import Database
 from .deserialize import deserialize
+from . import screening
+from .simulation import simulate
 from .__main__ import cli
 
 import unittest
@@ -73,6 +76,34 @@ class TestAqueous(unittest.TestCase):
         """Test the solvent dissociation."""
         self.aqueous.pKs(0.01, 25)
 
+    def test_arrays(self):
+        """Test that solvent properties broadcast over arrays."""
+        ionic_strength = np.linspace(0, 0.1, len(self.temperature_range))
+        for prop in ('dissociation', 'activity'):
+            args = (ionic_strength, self.temperature_range)
+            if prop == 'activity':
+                args = (2,) + args
+            values = getattr(self.aqueous, prop)(*args)
+            self.assertEqual(values.shape, self.temperature_range.shape)
+            for idx, value in enumerate(values):
+                single = getattr(self.aqueous, prop)(
+                    *[arg[idx] if np.ndim(arg) else arg for arg in args])
+                self.assertAlmostEqual(value / single, 1)
+
+    def test_cache(self):
+        """Test that scalar solvent properties are cached."""
+        value = self.aqueous.activity(1, 0.0123, 31.)
+        hits = self.aqueous.cache_info().hits
+        self.assertEqual(self.aqueous.activity(1, 0.0123, 31.), value)
+        self.assertGreater(self.aqueous.cache_info().hits, hits)
+        self.assertAlmostEqual(self.aqueous.activity(1, [0.0123], [31.])[0],
+                               value)
+        self.assertEqual(self.aqueous.dissociation(ionic_strength=0.0123,
+                                                   temperature=31.),
+                         self.aqueous.dissociation(0.0123, 31.))
+        info = self.aqueous.cache_info()
+        self.assertLessEqual(info.currsize, info.maxsize)
+
 
 class BaseTestIon(object):
     """Base class for ion tests."""
@@ -169,6 +200,66 @@ class TestIon(unittest.TestCase):
                         ion.mobility(pH, I, T)
                         ion.diffusivity(pH, I, T)
 
+    def test_vectorized(self):
+        """Test that ion properties broadcast over pH, I, and temperature."""
+        pH = np.linspace(2, 12, 6)
+        ionic_strength = np.linspace(0, 0.1, 6)
+        temperature = np.linspace(15, 40, 6)
+        for name in ('histidine', 'citric acid', 'tris', 'sodium'):
+            ion = self.database[name]
+            fraction = ion.ionization_fraction(pH, ionic_strength,
+                                               temperature)
+            self.assertEqual(fraction.shape, (6, len(ion.valence)))
+            for prop in ('mobility', 'charge', 'diffusivity',
+                         'molar_conductivity'):
+                values = getattr(ion, prop)(pH, ionic_strength, temperature)
+                self.assertEqual(values.shape, (6,))
+                for idx in range(6):
+                    self.assertAlmostEqual(
+                        values[idx] / getattr(ion, prop)(pH[idx],
+                                                         ionic_strength[idx],
+                                                         temperature[idx]),
+                        1)
+
+        # Grids broadcast, with states in the last axis.
+        fraction = ion.ionization_fraction(pH[:, np.newaxis],
+                                           ionic_strength[np.newaxis, :])
+        self.assertEqual(fraction.shape, (6, 6, len(ion.valence)))
+
+    def test_parameter_cache(self):
+        acid = Ion('acid', [-1, 1], [8., 3.], [-30e-9, 30e-9],
+                   enthalpy=[10000., 1000.])
+        self.assertEqual(acid.cache_info().currsize, 0)
+        pKa = acid._temperature_pKa(30.)
+        self.assertIs(acid._temperature_pKa(30), pKa)
+        self.assertFalse(pKa.flags.writeable)
+        self.assertEqual(acid.cache_info().hits, 1)
+
+        # Copies share the cache.
+        mobility = acid.absolute_mobility(30.)
+        self.assertIs(copy(acid).absolute_mobility(30.), mobility)
+
+        # Arrays of temperature are not cached.
+        misses = acid.cache_info().misses
+        acid.acidity(0., [20., 30.])
+        self.assertEqual(acid.cache_info().misses, misses)
+
+        for temperature in range(100):
+            acid.acidity(0.01, temperature)
+        info = acid.cache_info()
+        self.assertEqual(info.currsize, info.maxsize)
+        np.testing.assert_allclose(acid.acidity(0.01, 30.),
+                                   acid.acidity(0.01, [30.])[0])
+
+        # Warnings are raised again when values are found in the cache.
+        plain = Ion('plain', [-1], [3.], [-30e-9])
+        for _ in range(2):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                plain._temperature_pKa(30.)
+            self.assertEqual(len(caught), 1)
+            self.assertIn('No data available', str(caught[0].message))
+
     def test_equality(self):
         hcl = self.database.load('hydrochloric acid')
         hcl2 = self.database.load('hydrochloric acid')
@@ -176,6 +267,16 @@ class TestIon(unittest.TestCase):
         sol = Solution([hcl], [0.1])
         self.assertEqual(hcl, hcl2)
 
+        acid = Ion('acid', [-1], [3.], [-30e-9])
+        same = Ion('acid', np.array([-1]), [3], [-30e-9])
+        self.assertEqual(acid, same)
+        self.assertEqual(hash(acid), hash(same))
+        self.assertEqual(acid, copy(acid))
+        self.assertNotEqual(acid, Ion('acid', [-1], [4.], [-30e-9]))
+        self.assertNotEqual(acid, Ion('acid', [-1], [3.], [-30e-9],
+                                      enthalpy=[0.]))
+        self.assertNotEqual(acid, 'acid')
+
     def test_hash(self):
         for ion in self.database.keys():
             ion1 = self.database[ion]
@@ -243,6 +344,62 @@ class TestDatabase(unittest.TestCase):
     def test_import(self):
         [ion for ion in self.database]
 
+    def test_shared(self):
+        """Test that databases share parsed data and interned ions."""
+        self.assertIs(self.database.data, Database().data)
+        ion1, ion2 = self.database['tris'], Database()['tris']
+        self.assertEqual(ion1, ion2)
+        self.assertIsNot(ion1, ion2)
+        self.assertEqual(self.database['chloride'],
+                         self.database['hydrochloric acid'])
+
+        # Copies take their own context.
+        ion1.context({'pH': 8})
+        self.assertIsNone(ion2.context())
+        self.assertIsNone(self.database['tris'].context())
+
+        with self.assertRaises(NameError):
+            self.database['not an ion']
+
+    def test_index(self):
+        """Test lookup by name, case and alias."""
+        self.assertIn('tris', self.database)
+        self.assertIn('TRIS', self.database)
+        self.assertIn('chloride', self.database)
+        self.assertIn('H+', self.database)
+        self.assertNotIn('not an ion', self.database)
+        self.assertNotIn(None, self.database)
+        self.assertEqual(self.database['Tris'], self.database['tris'])
+        self.assertEqual(self.database['chloride'].name, 'hydrochloric acid')
+        self.assertEqual(len(list(self.database)),
+                         len(self.database.keys()))
+        self.assertEqual(self.database.keys(), sorted(self.database.data))
+
+    def test_suggest(self):
+        self.assertEqual(self.database.suggest('tri')[0], 'tris')
+        self.assertEqual(self.database.suggest('Hydrocloric acid')[0],
+                         'hydrochloric acid')
+        self.assertEqual(self.database.suggest('sodum'), ('sodium',))
+        self.assertEqual(len(self.database.suggest('h', limit=3)), 3)
+        self.assertEqual(self.database.suggest('xyz'), ())
+        for name in self.database.keys():
+            self.assertEqual(self.database.suggest(name)[0].lower(),
+                             name.lower())
+
+    def test_table(self):
+        """Test that the binary table matches the JSON database."""
+        table_database = Database(Database.default_table)
+        self.assertEqual(table_database.keys(), self.database.keys())
+        for name in self.database.keys():
+            self.assertEqual(table_database[name], self.database[name])
+
+        table = table_database.table
+        self.assertIsInstance(table, np.memmap)
+        self.assertEqual(table.dtype, self.database.table.dtype)
+        row = table[table['key'] == 'tris'][0]
+        np.testing.assert_equal(row['reference_pKa'][:row['states']],
+                                self.database['tris'].reference_pKa)
+
     def test_search(self):
         for ion_name in self.database.keys():
             search_result = self.database.search(ion_name)
@@ -288,12 +445,135 @@ class TestSolution(unittest.TestCase):
         for pH in (1, 3, 5, 7):
             self.assertAlmostEqual(base.titrate(titrant, pH).pH, pH)
 
+    def test_titrate_multi(self):
+        """Test titration to several targets with several titrants."""
+        base = Solution(['tricine'], [0.02])
+        salt = Solution(['sodium', 'chloride'], [1., 1.])
+        result, diagnostics = base.titrate_multi(
+            {'sodium': ('pH', 8.3), salt: ('conductivity', 0.15)})
+        self.assertTrue(diagnostics['success'])
+        self.assertAlmostEqual(result.pH, 8.3)
+        self.assertAlmostEqual(result.conductivity(), 0.15)
+        sodium, fraction = diagnostics['amounts']
+        mixed = base * (1 - fraction) + salt * fraction + ('sodium', sodium)
+        self.assertAlmostEqual(mixed.pH, 8.3)
+
+        result, _ = base.titrate_multi({'sodium': 8.3,
+                                        'chloride': ('debye', 3e-9)},
+                                       guess=[0.01, 0.01])
+        self.assertAlmostEqual(result.pH, 8.3)
+        self.assertAlmostEqual(result.debye() / 3e-9, 1)
+
+        with self.assertRaises(TypeError):
+            base.titrate_multi({0.1: 7})
+
+        # Volume fractions stay below 1, even when the first step overshoots.
+        dilute = Solution(['sodium', 'chloride'], [.01, .01])
+        result, diagnostics = base.titrate_multi(
+            {dilute: ('conductivity', 0.1)})
+        self.assertTrue(0 < diagnostics['amounts'][0] < 1)
+        self.assertAlmostEqual(result.conductivity(), 0.1)
+        with self.assertRaises(RuntimeError):
+            base.titrate_multi({dilute: ('conductivity', 0.2)})
+        with self.assertRaises(ValueError):
+            base.titrate_multi({dilute: ('conductivity', 0.1)}, guess=[1.5])
+
+    def test_titration_curve(self):
+        """Test that titration curves match titration and fresh solutions."""
+        base = Solution(['tris'], [0.1])
+        base.temperature(30)
+        amounts = np.linspace(0, 0.2, 21)
+        curve = base.titration_curve('hydrochloric acid', amounts,
+                                     targets=[8, 7, 3, 0])
+        for amount, pH, conductivity in zip(amounts[::5], curve['pH'][::5],
+                                            curve['conductivity'][::5]):
+            fresh = Solution(['tris', 'hydrochloric acid'], [0.1, amount])
+            fresh.temperature(30)
+            self.assertAlmostEqual(pH, fresh.pH, 8)
+            self.assertAlmostEqual(conductivity, fresh.conductivity(), 8)
+
+        for pH, amount in zip(curve['targets'][:-1],
+                              curve['target_amounts'][:-1]):
+            titrated = base.titrate('hydrochloric acid', pH)
+            self.assertAlmostEqual(amount,
+                                   titrated.concentration('hydrochloric acid'))
+        self.assertTrue(np.isnan(curve['target_amounts'][-1]))
+
+        titrant = Solution('hydrochloric acid', 0.2)
+        curve = base.titration_curve(titrant, np.linspace(0, 1, 11),
+                                     targets=[7])
+        self.assertAlmostEqual((base * (1 - curve['target_amounts'][0]) +
+                                titrant * curve['target_amounts'][0]).pH, 7)
+
+        with self.assertRaises(TypeError):
+            base.titration_curve(0.1, amounts)
+
     def test_solution_properties(self):
         for buf in self.solutions:
             buf.conductivity()
             buf.debye()
             buf.buffering_capacity()
 
+    def test_pH_derivatives(self):
+        """Test the analytic derivatives against finite differences."""
+        names = ['histidine', 'acetic acid', 'sodium']
+        concentrations = [0.02, 0.05, 0.03]
+        sol = Solution(names, concentrations)
+        derivatives = sol.pH_derivatives()
+        for j, derivative in enumerate(derivatives):
+            step = concentrations[j] * 1e-6
+            up, down = list(concentrations), list(concentrations)
+            up[j] += step
+            down[j] -= step
+            difference = (Solution(names, up).pH -
+                          Solution(names, down).pH) / (2 * step)
+            self.assertAlmostEqual(derivative / difference, 1, 6)
+
+        insult = Ion('Acid Insult', [-1], [-2], [-1])
+        step = 1e-7
+        difference = step / (sol.pH - (sol + (insult, step)).pH)
+        self.assertAlmostEqual(sol.buffering_capacity() / difference, 1, 4)
+
+    def test_sensitivities(self):
+        """Test the analytic sensitivities against finite differences."""
+        def solution(pKa=(3., 8.), mobility=(-30e-9, 30e-9),
+                     concentration=0.01):
+            acid = Ion('acid', [-1, 1], pKa, mobility)
+            return Solution([acid, 'tris', 'hydrochloric acid'],
+                            [concentration, 0.02, 0.015])
+
+        def properties(sol):
+            return np.array([sol.pH, sol.ionic_strength, sol.conductivity()])
+
+        sensitivities = solution().sensitivities()
+        keys = ('pH', 'ionic_strength', 'conductivity')
+        cases = [('concentration', None, 1e-8,
+                  lambda h: solution(concentration=0.01 + h)),
+                 ('pKa', 1, 1e-6, lambda h: solution(pKa=(3., 8. + h))),
+                 ('mobility', 0, 1e-15,
+                  lambda h: solution(mobility=(-30e-9 + h, 30e-9)))]
+        for name, state, step, perturbed in cases:
+            difference = (properties(perturbed(step)) -
+                          properties(perturbed(-step))) / (2 * step)
+            for key, value in zip(keys, difference):
+                derivative = sensitivities[key][name][0]
+                if state is not None:
+                    derivative = derivative[state]
+                self.assertAlmostEqual(derivative, value,
+                                       delta=1e-5 * abs(value) + 1e-12)
+
+        step = 1e-8
+        difference = (solution(concentration=0.01 + step).properties()
+                      ['mobility'] -
+                      solution(concentration=0.01 - step).properties()
+                      ['mobility']) / (2 * step)
+        np.testing.assert_allclose(
+            sensitivities['mobility']['concentration'][:, 0], difference,
+            rtol=1e-5)
+
+        with self.assertRaises(TypeError):
+            Solution(['tris', NucleicAcid()], [0.01, 1e-6]).sensitivities()
+
     def test_transference(self):
         buf = self.solutions[-2]
         self.assertNotEqual(buf.transference('hydrochloric acid'), 0,
@@ -304,6 +584,19 @@ class TestSolution(unittest.TestCase):
                             'transference number.')
         self.assertEqual(buf.transference(Database()['bis-tris']), 0)
 
+    def test_water_transference(self):
+        sol = Solution(['tris', 'hydrochloric acid'], [0.02, 0.01])
+        for names, conductivity in ((('H+', 'hydronium'),
+                                     sol.hydronium_conductivity()),
+                                    (('OH-', 'hydroxide'),
+                                     sol.hydroxide_conductivity())):
+            for name in names:
+                self.assertAlmostEqual(sol.transference(name) /
+                                       conductivity * sol.conductivity(), 1)
+        total = (sum(sol.transference(ion) for ion in sol.ions) +
+                 sol.transference('H+') + sol.transference('OH-'))
+        self.assertAlmostEqual(total, 1)
+
     def test_zone_transfer(self):
         buf = self.solutions[-2]
         self.assertNotEqual(buf.zone_transfer('hydrochloric acid'), 0,
@@ -372,9 +665,62 @@ class TestSolution(unittest.TestCase):
         sol = Solution().equilibrate_CO2()
         self.assertAlmostEqual(sol.pH, 5.6, 1)
 
+        # The dissolved CO2 matches Henry's law.
+        buf = Solution(['tris', 'hydrochloric acid'], [0.02, 0.01])
+        buf.temperature(30)
+        sol = buf.equilibrate_CO2(0.01)
+        CO2 = Database()['carbonic acid']
+        neutral = sol.concentration(CO2) * \
+            (1 - np.sum(CO2.ionization_fraction(sol.pH, sol.ionic_strength,
+                                                30)))
+        self.assertAlmostEqual(neutral / (0.01 * Aqueous.henry_CO2(30)), 1)
+        self.assertAlmostEqual(sol.equilibrate_CO2(0.01).pH, sol.pH)
+
+    def test_co2_sweep(self):
+        buf = Solution(['tris', 'hydrochloric acid'], [0.02, 0.01])
+        pressures = np.logspace(-4, -1, 4)[:, np.newaxis]
+        sweep = buf.co2_sweep(pressures, [15., 25.])
+        self.assertEqual(sweep['pH'].shape, (4, 2))
+        self.assertTrue(np.all(np.diff(sweep['pH'], axis=0) < 0))
+        for key in ('ionic_strength', 'conductivity', 'CO2'):
+            self.assertEqual(sweep[key].shape, (4, 2))
+
+        buf.temperature(15.)
+        sol = buf.equilibrate_CO2(pressures[2, 0])
+        self.assertAlmostEqual(sweep['pH'][2, 0], sol.pH)
+        self.assertAlmostEqual(sweep['conductivity'][2, 0] /
+                               sol.conductivity(), 1, 5)
+
+    def test_itp_train(self):
+        leading = Solution(['hydrochloric acid', 'tris'], [0.01, 0.02])
+        analytes = ['acetic acid', 'mes', 'hepes']
+        zones = leading.itp_train('hydrochloric acid', analytes, 'glycine')
+        self.assertEqual(len(zones), 4)
+
+        velocity = 1. / leading.zone_transfer('hydrochloric acid')
+        previous = leading
+        for zone, ion in zip(zones, analytes + ['glycine']):
+            self.assertIn(ion, zone)
+            self.assertAlmostEqual(1. / zone.zone_transfer(ion) / velocity, 1)
+            # The counter-ion is conserved across each boundary.
+            flux = [sol.concentration('tris') *
+                    (1. / sol.zone_transfer('tris') - velocity)
+                    for sol in (previous, zone)]
+            self.assertAlmostEqual(flux[1] / flux[0], 1)
+            previous = zone
+
+        displaced = leading.displace('hydrochloric acid', 'acetic acid')
+        self.assertAlmostEqual(displaced.concentration('acetic acid'),
+                               zones[0].concentration('acetic acid'))
+
     def test_displace(self):
         sol = Solution(['tris', 'acetic acid'], [0.01, 0.005])
-        cycle = sol.displace('tris', 'bis-tris').displace('bis-tris', 'tris')
+        displaced = sol.displace('tris', 'bis-tris')
+        self.assertIn('bis-tris', displaced)
+        self.assertNotIn('tris', displaced)
+        self.assertGreater(displaced.concentration('bis-tris'), 0)
+        self.assertEqual(displaced.concentration('tris'), 0)
+        cycle = displaced.displace('bis-tris', 'tris')
         self.assertAlmostEqual(sol.pH, cycle.pH, 1)
         # Check that guesses work for solutions where the initial concentration
         # does not converge to the correct value
@@ -382,6 +728,190 @@ class TestSolution(unittest.TestCase):
         cycle = sol.displace('chloride', guess=[0.009, 0.004])
         self.assertAlmostEqual(sol.pH, cycle.pH, 0)
 
+    def test_adjusted_zone_zero_flux(self):
+        """Test an adjusted zone with an ion that moves with the boundary."""
+        from .Solution.isotachophoresis import _adjusted_zone
+        from .constants import lpm3
+        sol = Solution(['tris', 'chloride', 'hepes'], [0.02, 0.01, 0.005])
+        properties = sol.properties()
+        velocity = lpm3 * properties['mobility'][0] / \
+            properties['conductivity']
+        zone = _adjusted_zone(sol, sol.ions[1], None, velocity)
+        properties = zone.properties()
+        self.assertAlmostEqual(lpm3 * properties['mobility'][0] /
+                               properties['conductivity'] / velocity, 1)
+
+    def test_properties(self):
+        sol = Solution(['tris', 'chloride', 'hepes'], [0.02, 0.01, 0.01])
+        properties = sol.properties()
+        self.assertIs(properties['mobility'], sol.properties()['mobility'])
+        for index, ion in enumerate(sol.ions):
+            np.testing.assert_allclose(properties['ionization_fraction'][index],
+                                       ion.ionization_fraction())
+            np.testing.assert_allclose(properties['actual_mobility'][index],
+                                       ion.actual_mobility())
+            self.assertAlmostEqual(properties['mobility'][index] /
+                                   ion.mobility(), 1.)
+            self.assertAlmostEqual(properties['transference'][index],
+                                   sol.concentration(ion) *
+                                   ion.molar_conductivity() /
+                                   sol.conductivity())
+        self.assertLess(sum(properties['transference']), 1.)
+
+        with sol.temperature(30):
+            self.assertIsNot(sol.properties()['mobility'],
+                             properties['mobility'])
+            self.assertNotAlmostEqual(sol.conductivity(),
+                                      properties['conductivity'])
+
+    def test_properties_protected(self):
+        """Test that changing a snapshot does not change the solution."""
+        sol = Solution(['tris', 'chloride'], [0.02, 0.01])
+        conductivity = sol.conductivity()
+        transference = [sol.transference(ion) for ion in sol.ions]
+
+        properties = sol.properties()
+        with self.assertRaises(ValueError):
+            properties['mobility'][:] = 0
+        with self.assertRaises(ValueError):
+            properties['actual_mobility'][0][:] = 0
+        properties['conductivity'] = 0
+        properties['transference'] = None
+
+        self.assertEqual(sol.conductivity(), conductivity)
+        self.assertEqual([sol.transference(ion) for ion in sol.ions],
+                         transference)
+        sol.displace('chloride', 'hepes')
+
+    def test_name_lookup(self):
+        sol = Solution(['tris', 'chloride'], [0.1, 0.05])
+        self.assertIs(sol['chloride'], sol['hydrochloric acid'])
+        self.assertIs(sol[Database()['tris']], sol['tris'])
+        self.assertAlmostEqual(sol.concentration('chloride'), 0.05)
+        self.assertAlmostEqual(sol.concentration(Database()['tris']), 0.1)
+        self.assertIn('H+', sol)
+        self.assertIn(Database()['tris'], sol)
+        self.assertNotIn('acetic acid', sol)
+        self.assertNotIn([], sol)
+        with self.assertRaises(KeyError):
+            sol['acetic acid']
+
+    def test_derived(self):
+        """Test that warm started solutions match solutions from scratch."""
+        sol = Solution(['tris', 'hydrochloric acid'], [0.1, 0.05])
+        sol.temperature(30)
+        derived = [(sol + ('hydrochloric acid', 0.001),
+                    Solution(['tris', 'hydrochloric acid'], [0.1, 0.051])),
+                   (sol * 2, Solution(['tris', 'hydrochloric acid'],
+                                      [0.2, 0.1])),
+                   (sol / 2, Solution(['tris', 'hydrochloric acid'],
+                                      [0.05, 0.025]))]
+        for warm, cold in derived:
+            cold.temperature(30)
+            self.assertEqual(warm.temperature(), 30)
+            self.assertAlmostEqual(warm.pH, cold.pH, 10)
+            self.assertAlmostEqual(warm.ionic_strength, cold.ionic_strength,
+                                   10)
+
+    def test_lazy(self):
+        """Test that equilibria are solved on demand and remembered."""
+        sol = Solution(['tris', 'hydrochloric acid'], [0.1, 0.05])
+        self.assertTrue(sol._stale)
+        pH = sol.pH
+        self.assertFalse(sol._stale)
+        with sol.temperature(35):
+            self.assertTrue(sol._stale)
+            self.assertNotEqual(sol.pH, pH)
+        self.assertEqual(sol.pH, pH)
+        self.assertEqual(sorted(sol._equilibria), [25., 35.])
+
+    def test_interaction_cache(self):
+        """Test that Onsager-Fuoss factors are shared by a solution's ions."""
+        from .Ion.mobility import _solution_interaction
+        sol = Solution(['tris', 'hydrochloric acid', 'histidine'],
+                       [0.05, 0.02, 0.01])
+        factors = sol._interaction_factors()
+        self.assertIs(factors, sol._interaction_factors())
+        for ion in sol.ions:
+            expected = _solution_interaction(sol, [Database()['bis-tris']])
+            np.testing.assert_allclose(factors[ion], expected[ion])
+
+        with sol.temperature(30):
+            self.assertIsNot(factors, sol._interaction_factors())
+
+    def test_electropherogram(self):
+        """Test the electropherogram against each analyte in context."""
+        bge = Solution(['tris', 'hydrochloric acid'], [0.04, 0.02])
+        names = ['formic acid', 'histidine', 'citric acid', 'sodium']
+        analytes = names + [Peptide(sequence='AKDRGE'),
+                            NucleicAcid(size=100)]
+        length, voltage, eof = 0.5, 2e4, 5e-8
+        result = bge.electropherogram(analytes, length, voltage, eof,
+                                      detector=0.4, injection_length=1e-3)
+        self.assertIs(bge._background(), bge._background())
+
+        for index, analyte in enumerate(analytes):
+            if isinstance(analyte, str):
+                analyte = Database()[analyte]
+            with analyte.context(bge):
+                self.assertAlmostEqual(result['mobility'][index] /
+                                       analyte.mobility(), 1)
+                self.assertAlmostEqual(result['diffusivity'][index] /
+                                       analyte.diffusivity(), 1)
+
+        velocity = (result['mobility'] + eof) * voltage / length
+        np.testing.assert_allclose(result['velocity'], velocity)
+        detected = velocity > 0
+        self.assertFalse(np.all(detected))
+        np.testing.assert_allclose(result['time'][detected],
+                                   0.4 / velocity[detected])
+        self.assertTrue(np.all(np.isinf(result['time'][~detected])))
+        self.assertTrue(np.all(np.isnan(result['width'][~detected])))
+
+        resolution = result['resolution'][np.ix_(detected, detected)]
+        np.testing.assert_allclose(resolution, resolution.T)
+        np.testing.assert_allclose(np.diag(resolution), 0)
+
+    def test_solvers(self):
+        """Test that the pH solvers agree, including for zwitterions."""
+        for ions, concentrations in ((['tris', 'hydrochloric acid'],
+                                      [0.1, 0.05]),
+                                     (['histidine', 'hydrochloric acid'],
+                                      [0.01, 0.005]),
+                                     (['citric acid', 'sodium', 'glycine'],
+                                      [0.01, 0.02, 0.005])):
+            polynomial = Solution(ions, concentrations, solver='polynomial')
+            balance = Solution(ions, concentrations, solver='charge_balance')
+            self.assertAlmostEqual(polynomial.pH, balance.pH)
+            self.assertAlmostEqual(polynomial.ionic_strength,
+                                   balance.ionic_strength)
+
+        # Histidine is half protonated near its imidazole pKa.
+        histidine = Solution(['histidine', 'hydrochloric acid'],
+                             [0.01, 0.005], solver='polynomial')
+        self.assertAlmostEqual(histidine.pH, 6.07, 1)
+
+        with self.assertRaises(ValueError):
+            Solution('tris', 0.1, solver='unknown')
+
+    def test_many_species(self):
+        """Test that large solutions use the charge balance solver."""
+        database = Database()
+        names = [name for name in database.keys()
+                 if 'alias_of' not in database.data[name] and
+                 name not in ('hydronium', 'hydroxide')][:40]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            sol = Solution(names, [0.001] * len(names))
+        self.assertEqual(sol._pH_solver(), 'charge_balance')
+        charge = sum([sol.concentration(ion) * ion.charge()
+                      for ion in sol.ions])
+        charge += sol.concentration('H+') - \
+            sol._solvent.dissociation(sol.ionic_strength,
+                                      sol.temperature()) / \
+            sol.concentration('H+')
+        self.assertAlmostEqual(charge / sol.ionic_strength, 0)
+
     def test_safe(self):
         """Test safe pH evaluation."""
         sol = Solution('chloride', 0.001)
@@ -399,6 +929,226 @@ class TestSolution(unittest.TestCase):
         sol2 = Solution('chloride', 0.001)
         self.assertEqual(hash(sol1), hash(sol2))
 
+class TestSolutionArray(unittest.TestCase):
+
+    def setUp(self):
+        warnings.filterwarnings('ignore')
+        self.ions = ['tris', 'hydrochloric acid', 'acetic acid', 'histidine']
+        self.concentrations = [[0.03, 0.01, 0.02, 0.],
+                               [0.01, 0.02, 0., 0.005],
+                               [0., 0., 0., 0.],
+                               [0.1, 0.05, 0.01, 0.01]]
+        self.temperatures = [25., 25., 30., 15.]
+        self.solutions = Solution.batch(self.ions, self.concentrations,
+                                        self.temperatures)
+
+    def test_match_solution(self):
+        """Test that each row matches an independent Solution."""
+        conductivity = self.solutions.conductivity()
+        for idx, (c, T) in enumerate(zip(self.concentrations,
+                                         self.temperatures)):
+            sol = Solution(self.ions, c)
+            sol.temperature(T)
+            self.assertAlmostEqual(self.solutions.pH[idx], sol.pH, 5)
+            self.assertAlmostEqual(self.solutions.ionic_strength[idx] /
+                                   sol.ionic_strength, 1, 5)
+            self.assertAlmostEqual(conductivity[idx] / sol.conductivity(),
+                                   1, 5)
+
+    def test_transport(self):
+        """Test the effective mobility and diffusivity of each ion."""
+        mobility = self.solutions.mobility()
+        diffusivity = self.solutions.diffusivity()
+        for idx, sol in enumerate(self.solutions):
+            for jdx, ion in enumerate(self.solutions.ions):
+                if ion not in sol:
+                    continue
+                ion = sol.ions[sol.ions.index(ion)]
+                self.assertAlmostEqual(mobility[idx, jdx] / ion.mobility(),
+                                       1, 5)
+                self.assertAlmostEqual(diffusivity[idx, jdx] /
+                                       ion.diffusivity(), 1, 5)
+
+    def test_derive(self):
+        concentrations = np.array(self.concentrations) * 1.1
+        derived = self.solutions._derive(concentrations)
+        fresh = SolutionArray(self.ions, concentrations, self.temperatures)
+        np.testing.assert_allclose(derived.pH, fresh.pH)
+        np.testing.assert_allclose(derived.ionic_strength,
+                                   fresh.ionic_strength)
+
+    def test_getitem(self):
+        self.assertEqual(len(self.solutions), len(self.concentrations))
+        sol = self.solutions[1]
+        self.assertIsInstance(sol, Solution)
+        self.assertEqual(sol.concentration('histidine'), 0.005)
+
+    def test_polyion(self):
+        with self.assertRaises(TypeError):
+            SolutionArray([NucleicAcid()], [[1e-6]])
+
+    def test_shape(self):
+        """Test that concentrations must have one column per ion."""
+        single = SolutionArray(['tris', 'hydrochloric acid'], [0.02, 0.01])
+        self.assertEqual(len(single), 1)
+        with self.assertRaises(ValueError):
+            SolutionArray(['tris', 'hydrochloric acid'], [[0.02], [0.01]])
+        with self.assertRaises(ValueError):
+            SolutionArray(['tris', 'hydrochloric acid'], [[[0.02, 0.01]]])
+
+
+class TestScreening(unittest.TestCase):
+
+    def test_candidates(self):
+        anions = screening.candidates(-1)
+        cations = screening.candidates(1)
+        self.assertIn('hydrochloric acid', anions)
+        self.assertIn('tris', cations)
+        self.assertNotIn('tris', anions)
+        self.assertNotIn('hydroxide', anions)
+        self.assertEqual(len(anions), len(set(anions)))
+
+    def test_screen(self):
+        warnings.filterwarnings('ignore')
+        leading, trailing = ['hydrochloric acid'], ['hepes', 'mes']
+        counterions = ['tris', 'bis-tris']
+        serial = list(screening.screen(leading, trailing, counterions,
+                                       processes=1))
+        self.assertEqual(len(serial), 4)
+        self.assertEqual(sorted((result.trailing, result.counterion)
+                                for result in serial),
+                         sorted((name, counterion) for name in trailing
+                                for counterion in counterions))
+
+        result = serial[0]
+        leading_zone = Solution([result.leading, result.counterion],
+                                [0.01, 0.02])
+        trailing_zone = leading_zone.displace(result.leading,
+                                              result.trailing)
+        self.assertAlmostEqual(result.pH, leading_zone.pH)
+        self.assertAlmostEqual(result.trailing_pH, trailing_zone.pH)
+        self.assertAlmostEqual(result.velocity * leading_zone.zone_transfer(
+            result.leading), 1)
+
+        ranked = screening.rank(serial)
+        self.assertEqual(len(ranked), 4)
+        self.assertTrue(all(result.separability > 0 for result in ranked))
+        self.assertEqual(screening.rank(serial, by=('separability',))[0],
+                         max(serial, key=lambda result: result.separability))
+
+
+class TestAmpholyteMixture(unittest.TestCase):
+
+    def setUp(self):
+        warnings.filterwarnings('ignore')
+        self.mixture = AmpholyteMixture([4., 5.5, 6.2, 7., 8.5],
+                                        [.001, .002, .001, .003, .001],
+                                        delta_pKa=[1.5, 2., 2.5, 2., 3.],
+                                        mobility=[2e-8, 2.5e-8, 2.5e-8, 3e-8,
+                                                  2e-8])
+
+    def test_match_solution(self):
+        """Test that the profile matches a Solution of each species."""
+        ions, concentrations = ['tris', 'hydrochloric acid'], [.005, .003]
+        for temperature in (25., 30.):
+            profile = self.mixture.profile(ions=ions,
+                                           ion_concentrations=concentrations,
+                                           temperature=temperature)
+            sol = Solution(self.mixture.ions() + ions,
+                           list(self.mixture.concentrations) + concentrations)
+            sol.temperature(temperature)
+            self.assertAlmostEqual(profile['pH'][0], sol.pH)
+            self.assertAlmostEqual(profile['ionic_strength'][0] /
+                                   sol.ionic_strength, 1)
+            self.assertAlmostEqual(profile['conductivity'][0] /
+                                   sol.conductivity(), 1)
+
+    def test_distinct_mobilities(self):
+        """Test the profile of a mixture with many distinct mobilities."""
+        species = 60
+        mixture = AmpholyteMixture(np.linspace(4., 9., species),
+                                   .01 / species,
+                                   mobility=np.linspace(2e-8, 3e-8, species))
+        ions, concentrations = ['tris', 'hydrochloric acid'], [.005, .003]
+        profile = mixture.profile(ions=ions,
+                                  ion_concentrations=concentrations)
+        sol = Solution(mixture.ions() + ions,
+                       list(mixture.concentrations) + concentrations)
+        self.assertAlmostEqual(profile['pH'][0], sol.pH)
+        self.assertAlmostEqual(profile['conductivity'][0] /
+                               sol.conductivity(), 1, places=5)
+
+        mixture = AmpholyteMixture(np.linspace(3., 10., 2000), 1e-5,
+                                   mobility=np.linspace(2e-8, 3e-8, 2000))
+        position, concentrations = mixture.focus(0.05, 100, 2000.)
+        profile = mixture.profile(concentrations)
+        self.assertTrue(np.all(np.isfinite(profile['conductivity'])))
+        self.assertTrue(np.all(profile['conductivity'] > 0))
+
+    def test_focus(self):
+        mixture = AmpholyteMixture.uniform(3, 10, 2000, 0.02)
+        self.assertEqual(len(mixture), 2000)
+        self.assertAlmostEqual(np.sum(mixture.concentrations), 0.02)
+
+        position, concentrations = mixture.focus(0.05, 20, 2000.)
+        self.assertEqual(concentrations.shape, (20, 2000))
+        np.testing.assert_allclose(np.mean(concentrations, 0),
+                                   mixture.concentrations)
+
+        profile = mixture.profile(concentrations)
+        self.assertTrue(np.all(np.diff(profile['pH']) > 0))
+        self.assertTrue(3 < profile['pH'][0] < profile['pH'][-1] < 10)
+        self.assertTrue(np.all(profile['conductivity'] > 0))
+
+
+class TestSimulation(unittest.TestCase):
+
+    def test_zone_electrophoresis(self):
+        """Test that a dilute analyte moves at its mobility."""
+        warnings.filterwarnings('ignore')
+        cells, length, duration = 60, 0.01, 5.
+        position = (np.arange(cells) + .5) * length / cells
+        concentrations = np.zeros((cells, 3))
+        concentrations[:, :2] = 0.02, 0.01
+        concentrations[:, 2] = 1e-5 * np.exp(-((position - 0.004) /
+                                               0.0005)**2)
+
+        snapshots = []
+        final = simulate(['tris', 'hydrochloric acid', 'acetic acid'],
+                         concentrations, length, -200., duration,
+                         snapshots=3, output=snapshots.append)
+        self.assertEqual([snapshot.time for snapshot in snapshots],
+                         [0., duration / 2, duration])
+        self.assertIs(final, snapshots[-1])
+
+        initial = snapshots[0]
+        analyte = [snapshot.concentrations[:, 2] for snapshot in
+                   (initial, final)]
+        self.assertAlmostEqual(np.sum(analyte[1]) / np.sum(analyte[0]), 1)
+        shift = (np.sum(analyte[1] * position) / np.sum(analyte[1]) -
+                 np.sum(analyte[0] * position) / np.sum(analyte[0]))
+        expected = initial.mobility[0, 2] * initial.field[0] * duration
+        self.assertAlmostEqual(shift / expected, 1, 2)
+
+        buffer = Solution(['tris', 'hydrochloric acid'], [0.02, 0.01])
+        np.testing.assert_allclose(final.pH, buffer.pH, atol=1e-2)
+        np.testing.assert_allclose(final.conductivity,
+                                   buffer.conductivity(), rtol=1e-3)
+
+    def test_neutral(self):
+        """Test that a fully neutral ion stays in place."""
+        warnings.filterwarnings('ignore')
+        inert = Ion('inert', [-1], [400.], [-2e-8])
+        concentrations = np.zeros((20, 3))
+        concentrations[:, :2] = 0.02, 0.01
+        concentrations[5:10, 2] = 1e-3
+        final = simulate(['tris', 'hydrochloric acid', inert],
+                         concentrations, 0.01, -200., 1.)
+        self.assertTrue(np.all(np.isfinite(final.concentrations)))
+        np.testing.assert_allclose(final.concentrations[:, 2],
+                                   concentrations[:, 2])
+
+
 class TestNucleicAcid(unittest.TestCase):
 
     def test_mobility(self):
@@ -472,6 +1222,16 @@ class TestCLI(unittest.TestCase):
         result = runner.invoke(cli, ['ion', 'tris'])
         self.assertEqual(result.exit_code, 0)
 
+        result = runner.invoke(cli, ['ion', 'triss'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Did you mean', result.output)
+        self.assertIn('tris', result.output)
+
+        result = runner.invoke(cli, ['ion', 'acid'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Did you mean', result.output)
+        self.assertIn('acetic acid', result.output)
+
 
 if __name__ == '__main__':
     unittest.main()
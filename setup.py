@@ -25,7 +25,8 @@ setup(name='ionize',
       long_description_content_type='text/markdown',
       packages=find_packages(),
       requires=['numpy', 'scipy', 'biopython', 'click'],
-      package_data={'ionize': ['Database/ion_data.json']},
+      package_data={'ionize': ['Database/ion_data.json',
+                              'Database/ion_data.npy']},
       entry_points={'console_scripts': ['ionize = ionize.__main__:cli']},
       test_suite="ionize.tests",
       install_requires=["numpy",